@@ -70,6 +70,10 @@ def cleanup_benchmarks_database():
         indexes = [
             "CREATE INDEX idx_medicare_locality_map_zip ON medicare_locality_map(zip_code)",
             "CREATE INDEX idx_medicare_locality_map_carrier ON medicare_locality_map(carrier_code, locality_code)",
+            # State average lookups filter on state and gpci year; without these SQLite
+            # builds an automatic index for both tables on every execution
+            "CREATE INDEX idx_medicare_locality_map_state ON medicare_locality_map(state_code, carrier_code, locality_code)",
+            "CREATE INDEX idx_cms_gpci_year_locality ON cms_gpci(year, locality_code, locality_name)",
             "CREATE INDEX idx_medicare_locality_meta_mac ON medicare_locality_meta(mac_code, locality_code)",
             "CREATE INDEX idx_cms_gpci_locality ON cms_gpci(locality_name, locality_code, year)",
             "CREATE INDEX idx_cms_rvu_procedure ON cms_rvu(procedure_code, year)",
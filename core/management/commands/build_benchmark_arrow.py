@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.utils.medicare_benchmarks import MedicareBenchmarkLookup, build_benchmark_arrow_copy
+import os
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped Arrow IPC copies of the ASC/OPPS benchmark parquet files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild the copies even if they are current'
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        lookup = MedicareBenchmarkLookup()
+
+        for parquet_path in (lookup.asc_parquet_path, lookup.opps_parquet_path):
+            if not os.path.exists(parquet_path):
+                self.stdout.write(self.style.WARNING(f'Skipping missing parquet file: {parquet_path}'))
+                continue
+
+            try:
+                written = build_benchmark_arrow_copy(parquet_path, force=force)
+            except Exception as e:
+                raise CommandError(f'Failed to build Arrow IPC copy for {parquet_path}: {e}')
+
+            if written:
+                self.stdout.write(self.style.SUCCESS(f'Built Arrow IPC copy for {parquet_path}'))
+            else:
+                self.stdout.write(f'Arrow IPC copy is current for {parquet_path}')
@@ -1,4 +1,7 @@
-from django.test import TestCase, Client
+import os
+import sqlite3
+import tempfile
+from django.test import TestCase, SimpleTestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from unittest.mock import patch, MagicMock
@@ -121,3 +124,73 @@ class URLPatternTests(TestCase):
         overview_index = list(urlpatterns).index(overview_pattern)
         state_index = list(urlpatterns).index(state_pattern)
         self.assertLess(overview_index, state_index, "Overview should come before state insights")
+
+
+class _Unusable:
+    """A state value that blows up on any string handling."""
+    def __str__(self):
+        raise ValueError("unusable state")
+    
+    def upper(self):
+        raise ValueError("unusable state")
+
+
+class MedicareStateAvgBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        db_path = os.path.join(self.tmp_dir.name, 'benchmarks.db')
+        
+        # Smallest database the state average query can join: one GA locality for 99213
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE medicare_locality_map (zip_code TEXT, state_code TEXT, carrier_code TEXT, locality_code TEXT);
+            CREATE TABLE medicare_locality_meta (mac_code TEXT, locality_code TEXT, fee_schedule_area TEXT);
+            CREATE TABLE cms_gpci (locality_name TEXT, locality_code TEXT, year INTEGER, work_gpci REAL, pe_gpci REAL, mp_gpci REAL);
+            CREATE TABLE cms_rvu (procedure_code TEXT, modifier TEXT, year INTEGER, work_rvu REAL, practice_expense_rvu REAL, malpractice_rvu REAL);
+            CREATE TABLE cms_conversion_factor (year INTEGER, conversion_factor REAL);
+            INSERT INTO medicare_locality_map VALUES ('30309', 'GA', '10212', '01');
+            INSERT INTO medicare_locality_meta VALUES ('10212', '01', 'ATLANTA');
+            INSERT INTO cms_gpci VALUES ('ATLANTA', '01', 2025, 1.0, 1.0, 1.0);
+            INSERT INTO cms_rvu VALUES ('99213', NULL, 2025, 1.0, 1.0, 1.0);
+            INSERT INTO cms_conversion_factor VALUES (2025, 30.0);
+        """)
+        conn.commit()
+        conn.close()
+        
+        from core.utils.medicare_benchmarks import MedicareBenchmarkLookup
+        self.lookup = MedicareBenchmarkLookup()
+        self.lookup.db_path = db_path
+    
+    def test_bad_pair_does_not_drop_the_rest_of_the_batch(self):
+        """One failing pair comes back as None while every other pair keeps its rate"""
+        bad_state = _Unusable()
+        pairs = [('99213', 'GA'), ('99213', bad_state), ('73721', 'GA'), ('99213', 'ga')]
+        
+        # A single worker puts every pair in the same chunk
+        rates = self.lookup.get_professional_rates_state_avg(pairs, year=2025, max_workers=1)
+        
+        self.assertEqual(set(rates), set(pairs))
+        self.assertAlmostEqual(rates[('99213', 'GA')], 90.0)
+        self.assertIsNone(rates[('99213', bad_state)])
+        self.assertIsNone(rates[('73721', 'GA')])
+        self.assertAlmostEqual(rates[('99213', 'ga')], 90.0)
+    
+    def test_integer_cpt_code_still_matches(self):
+        """An int CPT code matches the TEXT column, as it does when bound straight into the query"""
+        self.assertAlmostEqual(self.lookup.get_professional_rate_state_avg(99213, 'GA', 2025), 90.0)
+        rates = self.lookup.get_professional_rates_state_avg([(99213, 'GA')], year=2025)
+        self.assertAlmostEqual(rates[(99213, 'GA')], 90.0)
+    
+    def test_rate_keys_are_loaded_once_per_database(self):
+        """A batch and a second lookup instance reuse the keys loaded for the same database"""
+        from core.utils.medicare_benchmarks import MedicareBenchmarkLookup, _load_professional_rate_keys
+        _load_professional_rate_keys.cache_clear()
+        
+        pairs = [('99213', 'GA'), ('73721', 'GA'), ('99213', 'FL'), ('99214', 'GA')]
+        self.lookup.get_professional_rates_state_avg(pairs, year=2025, max_workers=4)
+        other = MedicareBenchmarkLookup()
+        other.db_path = self.lookup.db_path
+        self.assertAlmostEqual(other.get_professional_rate_state_avg('99213', 'GA', 2025), 90.0)
+        
+        self.assertEqual(_load_professional_rate_keys.cache_info().misses, 1)
@@ -14,13 +14,147 @@ Features:
 import os
 import sqlite3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Resolved once at import rather than on every path lookup
+BENCHMARKS_DIR = Path(__file__).resolve().parent.parent / 'data' / 'benchmarks'
+
+# ASC/OPPS columns the rate indexes are keyed on; each load reads these plus its rate column
+BENCHMARK_KEY_COLUMNS = ['code', 'state', 'data_year']
+
+# Query to calculate a state average by averaging all localities in the state.
+# Bound parameters: (cpt_code, state_code, year)
+STATE_AVG_PROFESSIONAL_RATE_QUERY = """
+    SELECT
+        AVG(
+            (
+              (
+                COALESCE(rvu.work_rvu, 0) * COALESCE(gpci.work_gpci, 0) +
+                COALESCE(rvu.practice_expense_rvu, 0) * COALESCE(gpci.pe_gpci, 0) +
+                COALESCE(rvu.malpractice_rvu, 0) * COALESCE(gpci.mp_gpci, 0)
+              ) * COALESCE(cf.conversion_factor, 0)
+            )
+        ) AS state_avg_allowed_amount
+    FROM
+        medicare_locality_map mloc
+    JOIN
+        medicare_locality_meta meta
+        ON mloc.carrier_code = meta.mac_code
+        AND mloc.locality_code = meta.locality_code
+    JOIN
+        cms_gpci gpci
+        ON TRIM(meta.fee_schedule_area) = TRIM(gpci.locality_name)
+        AND mloc.locality_code = gpci.locality_code
+    JOIN
+        cms_rvu rvu
+        ON rvu.year = gpci.year
+        AND rvu.procedure_code = ?
+        AND (rvu.modifier IS NULL OR rvu.modifier = '')
+    JOIN
+        cms_conversion_factor cf
+        ON gpci.year = cf.year
+    WHERE
+        mloc.state_code = ?
+        AND gpci.year = ?
+"""
+
+
+@lru_cache(maxsize=8)
+def _load_professional_rate_keys(db_path: str, mtime: float, year: int) -> Tuple[frozenset, frozenset]:
+    """
+    Load the procedure codes and states that can have a professional rate for a year.
+    
+    Cached per (db_path, mtime, year) so every lookup instance and worker thread in the
+    process shares one copy, and a rebuilt database is picked up on its next use.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT DISTINCT procedure_code FROM cms_rvu WHERE year = ? AND (modifier IS NULL OR modifier = '')",
+            (year,)
+        )
+        procedure_codes = frozenset(str(row[0]).strip() for row in cursor.fetchall())
+        cursor.execute("SELECT DISTINCT state_code FROM medicare_locality_map")
+        state_codes = frozenset(str(row[0]).upper() for row in cursor.fetchall())
+    finally:
+        conn.close()
+    return procedure_codes, state_codes
+
+
+def _get_professional_rate_keys(db_path: str, year: int) -> Tuple[frozenset, frozenset]:
+    """
+    Get the procedure codes and states that can have a professional rate for a year.
+    
+    A CPT code or state outside these sets makes the state average query return
+    nothing, so misses are answered without running the join.
+    """
+    return _load_professional_rate_keys(db_path, os.path.getmtime(db_path), year)
+
+
+def _arrow_copy_path(parquet_path: str) -> Path:
+    """Get the path of the Arrow IPC copy kept beside a benchmark parquet file."""
+    return Path(parquet_path).with_suffix('.arrow')
+
+
+def _arrow_copy_is_current(parquet_path: str, arrow_path: Path) -> bool:
+    """Check that an Arrow IPC copy exists and is not older than its parquet file."""
+    return arrow_path.exists() and arrow_path.stat().st_mtime >= os.path.getmtime(parquet_path)
+
+
+def build_benchmark_arrow_copy(parquet_path: str, force: bool = False) -> bool:
+    """
+    Write the uncompressed Arrow IPC copy of a benchmark parquet file.
+    
+    Meant to run offline (manage.py build_benchmark_arrow), never from a web worker.
+    A current copy is kept unless it fails to read back or force is set.
+    
+    Returns:
+        bool: True if a copy was written
+    """
+    arrow_path = _arrow_copy_path(parquet_path)
+    if not force and _arrow_copy_is_current(parquet_path, arrow_path):
+        try:
+            feather.read_table(str(arrow_path), memory_map=True).validate(full=True)
+            return False
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Rebuilding unreadable Arrow IPC copy {arrow_path}: {str(e)}")
+    
+    # Write to a private temp file and rename, so a running server never sees a partial copy
+    tmp_path = arrow_path.with_name(f"{arrow_path.name}.{os.getpid()}.tmp")
+    feather.write_feather(pq.read_table(parquet_path), str(tmp_path), compression='uncompressed')
+    os.replace(tmp_path, arrow_path)
+    return True
+
+
+def _read_benchmark_table(parquet_path: str, columns: List[str]) -> pd.DataFrame:
+    """
+    Read columns of a benchmark parquet file, through its Arrow IPC copy when current.
+    
+    The copy is memory-mapped and only the requested columns are converted to pandas,
+    so a load skips parquet decoding and copies nothing it doesn't use. A missing,
+    stale or unreadable copy falls back to the parquet file; copies are only written
+    by build_benchmark_arrow_copy.
+    """
+    arrow_path = _arrow_copy_path(parquet_path)
+    try:
+        if _arrow_copy_is_current(parquet_path, arrow_path):
+            return feather.read_table(str(arrow_path), columns=columns, memory_map=True).to_pandas()
+        logger.info(f"No current Arrow IPC copy for {parquet_path}, reading parquet directly")
+    except (OSError, pa.ArrowException) as e:
+        logger.warning(f"Arrow IPC copy unreadable for {parquet_path}, reading parquet directly "
+                       f"(rebuild with manage.py build_benchmark_arrow): {str(e)}")
+    return pq.read_table(parquet_path, columns=columns).to_pandas()
+
 
 class MedicareBenchmarkLookup:
     """
@@ -43,6 +177,10 @@ class MedicareBenchmarkLookup:
         self._asc_df_loaded = False
         self._opps_df_loaded = False
         
+        # (code, state, year) -> rate indexes built from the parquet dataframes
+        self._asc_index = None
+        self._opps_index = None
+        
         # Validate file existence
         self._validate_files()
         
@@ -50,30 +188,15 @@ class MedicareBenchmarkLookup:
     
     def _get_db_path(self) -> str:
         """Get the path to the benchmarks SQLite database."""
-        return os.path.join(
-            Path(__file__).resolve().parent.parent,
-            'data',
-            'benchmarks',
-            'benchmarks.db'
-        )
+        return str(BENCHMARKS_DIR / 'benchmarks.db')
     
     def _get_asc_parquet_path(self) -> str:
         """Get the path to the ASC parquet file."""
-        return os.path.join(
-            Path(__file__).resolve().parent.parent,
-            'data',
-            'benchmarks',
-            'bench_medicare_asc.parquet'
-        )
+        return str(BENCHMARKS_DIR / 'bench_medicare_asc.parquet')
     
     def _get_opps_parquet_path(self) -> str:
         """Get the path to the OPPS parquet file."""
-        return os.path.join(
-            Path(__file__).resolve().parent.parent,
-            'data',
-            'benchmarks',
-            'bench_medicare_opps.parquet'
-        )
+        return str(BENCHMARKS_DIR / 'bench_medicare_opps.parquet')
     
     def _validate_files(self) -> None:
         """Validate that all required files exist."""
@@ -97,7 +220,9 @@ class MedicareBenchmarkLookup:
         if not self._asc_df_loaded:
             try:
                 if os.path.exists(self.asc_parquet_path):
-                    self._asc_df = pd.read_parquet(self.asc_parquet_path)
+                    self._asc_df = _read_benchmark_table(
+                        self.asc_parquet_path, BENCHMARK_KEY_COLUMNS + ['medicare_asc_stateavg']
+                    )
                     self._asc_df_loaded = True
                     logger.info(f"Loaded ASC data with {len(self._asc_df)} records")
                 else:
@@ -114,7 +239,9 @@ class MedicareBenchmarkLookup:
         if not self._opps_df_loaded:
             try:
                 if os.path.exists(self.opps_parquet_path):
-                    self._opps_df = pd.read_parquet(self.opps_parquet_path)
+                    self._opps_df = _read_benchmark_table(
+                        self.opps_parquet_path, BENCHMARK_KEY_COLUMNS + ['medicare_opps_stateavg']
+                    )
                     self._opps_df_loaded = True
                     logger.info(f"Loaded OPPS data with {len(self._opps_df)} records")
                 else:
@@ -189,19 +316,18 @@ class MedicareBenchmarkLookup:
                     AND mloc.locality_code = gpci.locality_code
                 JOIN
                     cms_rvu rvu
-                    ON 1=1
+                    ON rvu.year = gpci.year
+                    AND rvu.procedure_code = ?
+                    AND (rvu.modifier IS NULL OR rvu.modifier = '')
                 JOIN
                     cms_conversion_factor cf
                     ON gpci.year = cf.year
                 WHERE
                     mloc.zip_code = ?
                     AND gpci.year = ?
-                    AND rvu.year = ?
-                    AND rvu.procedure_code = ?
-                    AND (rvu.modifier IS NULL OR rvu.modifier = '')
                 """
                 
-                cursor.execute(query, (zip_code, year, year, cpt_code))
+                cursor.execute(query, (cpt_code, zip_code, year))
                 result = cursor.fetchone()
                 
                 if result:
@@ -243,46 +369,16 @@ class MedicareBenchmarkLookup:
                 logger.error(f"Database file not found: {self.db_path}")
                 return None
             
+            procedure_codes, state_codes = _get_professional_rate_keys(self.db_path, year)
+            # Compare as text, the way SQLite's TEXT affinity matches the bound parameters
+            if str(cpt_code).strip() not in procedure_codes or str(state).upper() not in state_codes:
+                logger.warning(f"No state average professional rate found for {cpt_code} in {state}")
+                return None
+            
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
-                # Query to calculate state average by averaging all localities in the state
-                query = """
-                SELECT
-                    AVG(
-                        (
-                          (
-                            COALESCE(rvu.work_rvu, 0) * COALESCE(gpci.work_gpci, 0) +
-                            COALESCE(rvu.practice_expense_rvu, 0) * COALESCE(gpci.pe_gpci, 0) +
-                            COALESCE(rvu.malpractice_rvu, 0) * COALESCE(gpci.mp_gpci, 0)
-                          ) * COALESCE(cf.conversion_factor, 0)
-                        )
-                    ) AS state_avg_allowed_amount
-                FROM
-                    medicare_locality_map mloc
-                JOIN
-                    medicare_locality_meta meta
-                    ON mloc.carrier_code = meta.mac_code
-                    AND mloc.locality_code = meta.locality_code
-                JOIN
-                    cms_gpci gpci
-                    ON TRIM(meta.fee_schedule_area) = TRIM(gpci.locality_name)
-                    AND mloc.locality_code = gpci.locality_code
-                JOIN
-                    cms_rvu rvu
-                    ON 1=1
-                JOIN
-                    cms_conversion_factor cf
-                    ON gpci.year = cf.year
-                WHERE
-                    mloc.state_code = ?
-                    AND gpci.year = ?
-                    AND rvu.year = ?
-                    AND rvu.procedure_code = ?
-                    AND (rvu.modifier IS NULL OR rvu.modifier = '')
-                """
-                
-                cursor.execute(query, (state.upper(), year, year, cpt_code))
+                cursor.execute(STATE_AVG_PROFESSIONAL_RATE_QUERY, (cpt_code, state.upper(), year))
                 result = cursor.fetchone()
                 
                 if result and result[0] is not None:
@@ -299,6 +395,91 @@ class MedicareBenchmarkLookup:
         except Exception as e:
             logger.error(f"Unexpected error in get_professional_rate_state_avg: {str(e)}")
             return None
+
+    def get_professional_rates_state_avg(self, pairs, year: int = 2025, max_workers: int = 8) -> Dict[Tuple[str, str], Optional[float]]:
+        """
+        Get Medicare professional rate state averages for many (CPT code, state) pairs.
+        
+        Runs the same query as get_professional_rate_state_avg. The pairs are split
+        across a small thread pool; each worker keeps one connection and cursor so only
+        the parameters change between its pairs (sqlite3 releases the GIL while a
+        statement runs, so the workers' queries overlap).
+        
+        Args:
+            pairs: Iterable of (cpt_code, state) tuples
+            year (int): Year for the rate calculation (default: 2025)
+            max_workers (int): Upper bound on concurrent connections (default: 8)
+        
+        Returns:
+            Dict[Tuple[str, str], Optional[float]]: State average rate (or None) keyed by input pair
+        """
+        rates = {}
+        pairs = list(pairs)
+        if not pairs:
+            return rates
+        
+        try:
+            if not os.path.exists(self.db_path):
+                logger.error(f"Database file not found: {self.db_path}")
+                return rates
+            
+            # Loaded once here and shared by every worker
+            try:
+                keys = _get_professional_rate_keys(self.db_path, year)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Could not load professional rate keys, querying every pair: {str(e)}")
+                keys = None
+            
+            workers = max(1, min(max_workers, os.cpu_count() or 1, len(pairs)))
+            chunks = [pairs[i::workers] for i in range(workers)]
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for chunk_rates in executor.map(lambda chunk: self._query_state_avg_rates(chunk, year, keys), chunks):
+                    rates.update(chunk_rates)
+            
+            logger.debug(f"Found {sum(rate is not None for rate in rates.values())}/{len(rates)} state average professional rates")
+            
+        except sqlite3.Error as e:
+            logger.error(f"Database error in get_professional_rates_state_avg: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error in get_professional_rates_state_avg: {str(e)}")
+        
+        return rates
+    
+    def _query_state_avg_rates(self, pairs, year: int, keys: Optional[Tuple[frozenset, frozenset]] = None) -> Dict[Tuple[str, str], Optional[float]]:
+        """
+        Run the state average query for a list of pairs on a dedicated connection.
+        
+        Each pair is handled on its own: a pair that fails is logged and comes back as
+        None, and the rest of the list still runs. keys are the (procedure codes, state
+        codes) loaded by the caller; without them every pair is queried.
+        """
+        rates = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+        except sqlite3.Error as e:
+            logger.error(f"Database error in _query_state_avg_rates: {str(e)}")
+            return {(cpt_code, state): None for cpt_code, state in pairs}
+        
+        procedure_codes, state_codes = keys if keys is not None else (None, None)
+        try:
+            cursor = conn.cursor()
+            for cpt_code, state in pairs:
+                try:
+                    # Compare as text, the way SQLite's TEXT affinity matches the bound parameters
+                    if procedure_codes is not None and (str(cpt_code).strip() not in procedure_codes
+                                                        or str(state).upper() not in state_codes):
+                        rates[(cpt_code, state)] = None
+                        continue
+                    cursor.execute(STATE_AVG_PROFESSIONAL_RATE_QUERY, (cpt_code, state.upper(), year))
+                    result = cursor.fetchone()
+                    rates[(cpt_code, state)] = float(result[0]) if result and result[0] is not None else None
+                except Exception as e:
+                    logger.error(f"Error getting state average professional rate for {cpt_code!r} in {state!r}: {str(e)}")
+                    rates[(cpt_code, state)] = None
+        finally:
+            conn.close()
+        return rates
     
     def get_institutional_rates(self, cpt_code: str, state: str, year: int = 2025) -> Dict[str, Optional[float]]:
         """
@@ -334,26 +515,29 @@ class MedicareBenchmarkLookup:
         
         return result
     
+    @staticmethod
+    def _build_rate_index(df: pd.DataFrame, rate_column: str) -> Dict[Tuple[str, str, int], Optional[float]]:
+        """
+        Index a benchmark dataframe by (code, state, year), keeping the first rate per key.
+        
+        Built once per load, so each rate lookup is a dict hit instead of a boolean
+        mask over the whole dataframe.
+        """
+        first = df.drop_duplicates(subset=['code', 'state', 'data_year'], keep='first')
+        rates = pd.to_numeric(first[rate_column], errors='coerce')
+        keys = zip(first['code'].tolist(), first['state'].tolist(), first['data_year'].tolist())
+        return {key: (None if pd.isna(rate) else rate) for key, rate in zip(keys, rates.tolist())}
+    
     def _get_asc_rate(self, cpt_code: str, state: str, year: int) -> Optional[float]:
         """Get ASC rate from parquet data."""
         try:
-            asc_df = self._load_asc_data()
-            if asc_df.empty:
-                return None
-            
-            # Filter for matching records
-            filtered = asc_df[
-                (asc_df['code'] == cpt_code) & 
-                (asc_df['state'] == state.upper()) & 
-                (asc_df['data_year'] == year)
-            ]
-            
-            if not filtered.empty:
-                # Return the first matching rate
-                rate = filtered['medicare_asc_stateavg'].iloc[0]
-                return float(rate) if pd.notna(rate) else None
+            if self._asc_index is None:
+                asc_df = self._load_asc_data()
+                if asc_df.empty:
+                    return None
+                self._asc_index = self._build_rate_index(asc_df, 'medicare_asc_stateavg')
             
-            return None
+            return self._asc_index.get((cpt_code, state.upper(), year))
             
         except Exception as e:
             logger.error(f"Error getting ASC rate for {cpt_code} in {state}: {str(e)}")
@@ -362,23 +546,13 @@ class MedicareBenchmarkLookup:
     def _get_opps_rate(self, cpt_code: str, state: str, year: int) -> Optional[float]:
         """Get OPPS rate from parquet data."""
         try:
-            opps_df = self._load_opps_data()
-            if opps_df.empty:
-                return None
-            
-            # Filter for matching records
-            filtered = opps_df[
-                (opps_df['code'] == cpt_code) & 
-                (opps_df['state'] == state.upper()) & 
-                (opps_df['data_year'] == year)
-            ]
-            
-            if not filtered.empty:
-                # Return the first matching rate
-                rate = filtered['medicare_opps_stateavg'].iloc[0]
-                return float(rate) if pd.notna(rate) else None
+            if self._opps_index is None:
+                opps_df = self._load_opps_data()
+                if opps_df.empty:
+                    return None
+                self._opps_index = self._build_rate_index(opps_df, 'medicare_opps_stateavg')
             
-            return None
+            return self._opps_index.get((cpt_code, state.upper(), year))
             
         except Exception as e:
             logger.error(f"Error getting OPPS rate for {cpt_code} in {state}: {str(e)}")
@@ -479,6 +653,9 @@ class MedicareBenchmarkLookup:
         self._opps_df = None
         self._asc_df_loaded = False
         self._opps_df_loaded = False
+        self._asc_index = None
+        self._opps_index = None
+        _load_professional_rate_keys.cache_clear()
         logger.info("Cleared parquet data cache")
     
     def get_cache_status(self) -> Dict[str, bool]:
@@ -489,3 +666,14 @@ class MedicareBenchmarkLookup:
             'asc_data_size': len(self._asc_df) if self._asc_df is not None else 0,
             'opps_data_size': len(self._opps_df) if self._opps_df is not None else 0
         }
+
+
+@lru_cache(maxsize=1)
+def get_medicare_lookup() -> MedicareBenchmarkLookup:
+    """
+    Get a shared MedicareBenchmarkLookup instance.
+    
+    The instance keeps its loaded ASC/OPPS dataframes, so repeated callers in the
+    same process skip the file checks and parquet loads.
+    """
+    return MedicareBenchmarkLookup()
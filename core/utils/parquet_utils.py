@@ -5,9 +5,11 @@ import glob
 from pathlib import Path
 import logging
 from typing import Optional, Dict, Any, List
+from functools import lru_cache
 import threading
 import hashlib
 import json
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +17,14 @@ class ParquetDataManager:
     # Class-level connection pool for better performance
     _connection_pool = {}
     _pool_lock = threading.Lock()
+    # DuckDB connections aren't thread-safe, so each thread queries through its own
+    # cursor on the pooled connection: {file_path: (pooled connection, cursor)}
+    _thread_cursors = threading.local()
+    # Unfiltered distinct values per (file_path, mtime, column), least recently used evicted
+    # first; the mtime in the key makes a replaced file miss instead of serving stale values
+    _unique_values_cache = OrderedDict()
+    _unique_values_lock = threading.Lock()
+    _unique_values_cache_size = 256
     
     def __init__(self, file_path: Optional[str] = None, state: Optional[str] = None, npi_type: Optional[str] = None):
         if file_path:
@@ -71,16 +81,36 @@ class ParquetDataManager:
             
             self.connection = self._connection_pool[self.file_path]
     
+    def _get_thread_cursor(self):
+        """Get this thread's cursor on the pooled connection for this file"""
+        cursors = getattr(self._thread_cursors, 'cursors', None)
+        if cursors is None:
+            cursors = self._thread_cursors.cursors = {}
+        
+        cached = cursors.get(self.file_path)
+        # A reinitialized pool entry means the old cursor belongs to a closed connection
+        if cached is None or cached[0] is not self.connection:
+            with self._pool_lock:
+                cursor = self.connection.cursor()
+            cached = cursors[self.file_path] = (self.connection, cursor)
+        return cached[1]
+    
     def _get_connection(self):
-        """Get connection, reinitialize if needed"""
+        """Get this thread's cursor on the pooled connection, reinitializing if needed.
+        
+        cursor() opens a separate connection to the same in-memory database, so it sees
+        the commercial_rates view while never being shared with another thread.
+        """
         if self.connection is None:
             self._init_connection()
+        if not self.connection:
+            return None
         
         # Test the connection to make sure it's still valid
         try:
-            if self.connection:
-                # Simple test query to verify connection is working
-                self.connection.execute("SELECT 1").fetchone()
+            cursor = self._get_thread_cursor()
+            # Simple test query to verify connection is working
+            cursor.execute("SELECT 1").fetchone()
         except Exception as e:
             logger.warning(f"Connection test failed, reinitializing: {str(e)}")
             # Connection is corrupted, reinitialize
@@ -92,8 +122,9 @@ class ParquetDataManager:
                         pass
                     del self._connection_pool[self.file_path]
             self._init_connection()
+            cursor = self._get_thread_cursor() if self.connection else None
         
-        return self.connection
+        return cursor
     
     @classmethod
     def cleanup_connections(cls):
@@ -106,6 +137,8 @@ class ParquetDataManager:
                     except:
                         pass
             cls._connection_pool.clear()
+            with cls._unique_values_lock:
+                cls._unique_values_cache.clear()
             logger.info("Cleaned up all database connections")
     
     @staticmethod
@@ -294,6 +327,13 @@ class ParquetDataManager:
 
     def get_unique_values(self, column: str, filters: Optional[Dict[str, Any]] = None) -> List[Any]:
         """Get unique values for a column with optional filters."""
+        # DuckDB already reads only this column and pushes the filters into the parquet
+        # scan; what's left to save is rescanning the file for the same unfiltered list
+        cache_key = None if filters else self._unique_values_cache_key(column)
+        cached = self._get_cached_unique_values(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             con = self._get_connection()
             if not con:
@@ -314,12 +354,97 @@ class ParquetDataManager:
             """
             
             result = con.execute(query).fetchall()
-            return [r[0] for r in result if r[0] and str(r[0]).strip() and str(r[0]).lower() != 'none']  # Filter out None/empty values and string "None"
+            values = self._clean_unique_values(r[0] for r in result)
+            self._cache_unique_values(cache_key, values)
+            return values
             
         except Exception as e:
             logger.error(f"Error getting unique values for {column}: {str(e)}")
             return []
 
+    def get_unique_values_for_columns(self, columns: List[str], filters: Optional[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+        """Get unique values for several columns at once, from a single scan of the data."""
+        unique_values = {}
+        cache_keys = {}
+        pending = []
+        for column in columns:
+            cache_keys[column] = None if filters else self._unique_values_cache_key(column)
+            cached = self._get_cached_unique_values(cache_keys[column])
+            if cached is not None:
+                unique_values[column] = cached
+            else:
+                pending.append(column)
+        if not pending:
+            return unique_values
+        
+        try:
+            con = self._get_connection()
+            if not con:
+                logger.error("No database connection available")
+                return {column: unique_values.get(column, []) for column in columns}
+            
+            # Build WHERE clause from filters
+            where_sql = self.build_where_clause(filters or {})
+            
+            # One DISTINCT list per column, all gathered in the same pass over the file
+            select_sql = ",\n".join(
+                f"list_sort(list(DISTINCT {column}) FILTER (WHERE {column} IS NOT NULL AND {column} != '' AND {column} != 'None'))"
+                for column in pending
+            )
+            query = f"""
+                SELECT
+                    {select_sql}
+                FROM commercial_rates
+                WHERE {where_sql}
+            """
+            
+            row = con.execute(query).fetchone()
+            for column, values in zip(pending, row):
+                values = self._clean_unique_values(values or [])
+                self._cache_unique_values(cache_keys[column], values)
+                unique_values[column] = values
+            
+        except Exception as e:
+            logger.error(f"Error getting unique values for {pending}: {str(e)}")
+        
+        return {column: unique_values.get(column, []) for column in columns}
+    
+    def _unique_values_cache_key(self, column: str):
+        """Cache key for a column's unfiltered values, or None when the file can't be stat'ed."""
+        try:
+            mtime = os.path.getmtime(self.file_path) if self.has_data else None
+        except OSError:
+            return None
+        return (self.file_path, mtime, column)
+    
+    @classmethod
+    def _get_cached_unique_values(cls, cache_key) -> Optional[List[Any]]:
+        """Return a copy of the cached values for a key, or None on a miss."""
+        if cache_key is None:
+            return None
+        with cls._unique_values_lock:
+            cached = cls._unique_values_cache.get(cache_key)
+            if cached is None:
+                return None
+            cls._unique_values_cache.move_to_end(cache_key)
+        return list(cached)
+    
+    @classmethod
+    def _cache_unique_values(cls, cache_key, values: List[Any]) -> None:
+        """Store values under a key, evicting the least recently used entries past the size limit."""
+        if cache_key is None:
+            return
+        with cls._unique_values_lock:
+            cls._unique_values_cache[cache_key] = tuple(values)
+            cls._unique_values_cache.move_to_end(cache_key)
+            while len(cls._unique_values_cache) > cls._unique_values_cache_size:
+                cls._unique_values_cache.popitem(last=False)
+    
+    @staticmethod
+    def _clean_unique_values(values) -> List[Any]:
+        """Filter out None/empty values and string "None" """
+        return [v for v in values if v and str(v).strip() and str(v).lower() != 'none']
+
     def get_aggregated_stats(self, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Get aggregated statistics with optional filters."""
         try:
@@ -337,132 +462,80 @@ class ParquetDataManager:
             # Build WHERE clause from filters
             where_sql = self.build_where_clause(filters or {})
             
-            # Professional rates (billing_class = 'professional')
+            # Professional rates (billing_class = 'professional'). DuckDB averages each
+            # column over its positive values in one pass, so only a single row comes back
             prof_query = f"""
-                SELECT 
-                    rate,
-                    GA_PROF_MAR,
-                    medicare_prof
-                FROM commercial_rates
-                WHERE {where_sql}
-                AND billing_class = 'professional'
-                AND rate IS NOT NULL
+                SELECT
+                    COUNT(*),
+                    AVG(rate_value) FILTER (WHERE rate_value > 0),
+                    AVG(ga_mar) FILTER (WHERE ga_mar > 0),
+                    AVG(medicare) FILTER (WHERE medicare > 0)
+                FROM (
+                    SELECT
+                        TRY_CAST(rate AS DOUBLE) AS rate_value,
+                        TRY_CAST(GA_PROF_MAR AS DOUBLE) AS ga_mar,
+                        TRY_CAST(medicare_prof AS DOUBLE) AS medicare
+                    FROM commercial_rates
+                    WHERE {where_sql}
+                    AND billing_class = 'professional'
+                    AND rate IS NOT NULL
+                )
             """
             
-            prof_data = con.execute(prof_query).fetchall()
-            
-            # Calculate professional statistics
-            prof_rates = []
-            prof_ga_mar = []
-            prof_medicare = []
+            prof_count, avg_prof_rate, avg_prof_ga_mar, avg_prof_medicare = con.execute(prof_query).fetchone()
             
-            for row in prof_data:
-                try:
-                    rate = float(row[0]) if row[0] else 0
-                    ga_mar = float(row[1]) if row[1] else 0
-                    medicare = float(row[2]) if row[2] else 0
-                    
-                    if rate > 0:
-                        prof_rates.append(rate)
-                    if ga_mar > 0:
-                        prof_ga_mar.append(ga_mar)
-                    if medicare > 0:
-                        prof_medicare.append(medicare)
-                except (ValueError, TypeError):
-                    continue
-            
-            # Calculate averages and percentages
-            avg_prof_rate = sum(prof_rates) / len(prof_rates) if prof_rates else 0
-            avg_prof_ga_mar = sum(prof_ga_mar) / len(prof_ga_mar) if prof_ga_mar else 0
-            avg_prof_medicare = sum(prof_medicare) / len(prof_medicare) if prof_medicare else 0
+            # AVG over no positive values is NULL
+            avg_prof_rate = avg_prof_rate or 0
+            avg_prof_ga_mar = avg_prof_ga_mar or 0
+            avg_prof_medicare = avg_prof_medicare or 0
             
             # Calculate percentages
-            prof_ga_pct = 0
-            prof_medicare_pct = 0
-            
-            if prof_rates and prof_ga_mar:
-                prof_ga_pct = (avg_prof_rate / avg_prof_ga_mar) * 100 if avg_prof_ga_mar > 0 else 0
-            
-            if prof_rates and prof_medicare:
-                prof_medicare_pct = (avg_prof_rate / avg_prof_medicare) * 100 if avg_prof_medicare > 0 else 0
+            prof_ga_pct = (avg_prof_rate / avg_prof_ga_mar) * 100 if avg_prof_ga_mar > 0 else 0
+            prof_medicare_pct = (avg_prof_rate / avg_prof_medicare) * 100 if avg_prof_medicare > 0 else 0
             
             # Facility rates (billing_class = 'institutional') - skip for NPI-1
             if is_npi1:
-                facility_data = []
+                facility_count = 0
+                avg_facility_rate = avg_ga_op_mar = avg_ga_asc_mar = avg_medicare_opps_mar = avg_medicare_asc_mar = 0
             else:
+                # OP MAR benchmarks only count for hospital taxonomies, ASC MAR benchmarks only for non-hospital ones
                 facility_query = f"""
-                    SELECT 
-                        rate,
-                        GA_OP_MAR,
-                        GA_ASC_MAR,
-                        medicare_opps_mar_stateavg,
-                        medicare_asc_mar_stateavg,
-                        primary_taxonomy_desc
-                    FROM commercial_rates
-                    WHERE {where_sql}
-                    AND billing_class = 'institutional'
-                    AND rate IS NOT NULL
+                    SELECT
+                        COUNT(*),
+                        AVG(rate_value) FILTER (WHERE rate_value > 0),
+                        AVG(ga_op) FILTER (WHERE ga_op > 0 AND is_hospital),
+                        AVG(ga_asc) FILTER (WHERE ga_asc > 0 AND NOT is_hospital),
+                        AVG(medicare_opps) FILTER (WHERE medicare_opps > 0 AND is_hospital),
+                        AVG(medicare_asc) FILTER (WHERE medicare_asc > 0 AND NOT is_hospital)
+                    FROM (
+                        SELECT
+                            TRY_CAST(rate AS DOUBLE) AS rate_value,
+                            TRY_CAST(GA_OP_MAR AS DOUBLE) AS ga_op,
+                            TRY_CAST(GA_ASC_MAR AS DOUBLE) AS ga_asc,
+                            TRY_CAST(medicare_opps_mar_stateavg AS DOUBLE) AS medicare_opps,
+                            TRY_CAST(medicare_asc_mar_stateavg AS DOUBLE) AS medicare_asc,
+                            contains(COALESCE(primary_taxonomy_desc, ''), 'Hospital') AS is_hospital
+                        FROM commercial_rates
+                        WHERE {where_sql}
+                        AND billing_class = 'institutional'
+                        AND rate IS NOT NULL
+                    )
                 """
                 
-                facility_data = con.execute(facility_query).fetchall()
-            
-            # Calculate facility statistics
-            facility_rates = []
-            ga_op_mar = []
-            ga_asc_mar = []
-            medicare_opps_mar = []
-            medicare_asc_mar = []
-            
-            for row in facility_data:
-                try:
-                    rate = float(row[0]) if row[0] else 0
-                    ga_op = float(row[1]) if row[1] else 0
-                    ga_asc = float(row[2]) if row[2] else 0
-                    medicare_opps = float(row[3]) if row[3] else 0
-                    medicare_asc = float(row[4]) if row[4] else 0
-                    primary_taxonomy_desc = row[5] if row[5] else ''
-                    
-                    if rate > 0:
-                        facility_rates.append(rate)
-                    # Only include GA WCFS OP MAR calculations when taxonomy contains 'Hospital'
-                    if ga_op > 0 and 'Hospital' in primary_taxonomy_desc:
-                        ga_op_mar.append(ga_op)
-                    # Only include GA WCFS ASC MAR calculations when taxonomy does NOT contain 'Hospital'
-                    if ga_asc > 0 and 'Hospital' not in primary_taxonomy_desc:
-                        ga_asc_mar.append(ga_asc)
-                    # Only include Medicare OP MAR calculations when taxonomy contains 'Hospital'
-                    if medicare_opps > 0 and 'Hospital' in primary_taxonomy_desc:
-                        medicare_opps_mar.append(medicare_opps)
-                    # Only include Medicare ASC MAR calculations when taxonomy does NOT contain 'Hospital'
-                    if medicare_asc > 0 and 'Hospital' not in primary_taxonomy_desc:
-                        medicare_asc_mar.append(medicare_asc)
-                except (ValueError, TypeError):
-                    continue
-            
-            # Calculate facility averages
-            avg_facility_rate = sum(facility_rates) / len(facility_rates) if facility_rates else 0
-            avg_ga_op_mar = sum(ga_op_mar) / len(ga_op_mar) if ga_op_mar else 0
-            avg_ga_asc_mar = sum(ga_asc_mar) / len(ga_asc_mar) if ga_asc_mar else 0
-            avg_medicare_opps_mar = sum(medicare_opps_mar) / len(medicare_opps_mar) if medicare_opps_mar else 0
-            avg_medicare_asc_mar = sum(medicare_asc_mar) / len(medicare_asc_mar) if medicare_asc_mar else 0
+                (facility_count, avg_facility_rate, avg_ga_op_mar, avg_ga_asc_mar,
+                 avg_medicare_opps_mar, avg_medicare_asc_mar) = con.execute(facility_query).fetchone()
+                
+                avg_facility_rate = avg_facility_rate or 0
+                avg_ga_op_mar = avg_ga_op_mar or 0
+                avg_ga_asc_mar = avg_ga_asc_mar or 0
+                avg_medicare_opps_mar = avg_medicare_opps_mar or 0
+                avg_medicare_asc_mar = avg_medicare_asc_mar or 0
             
             # Calculate facility percentages
-            facility_ga_op_pct = 0
-            facility_ga_asc_pct = 0
-            facility_medicare_op_pct = 0
-            facility_medicare_asc_pct = 0
-            
-            if facility_rates and ga_op_mar:
-                facility_ga_op_pct = (avg_facility_rate / avg_ga_op_mar) * 100 if avg_ga_op_mar > 0 else 0
-            
-            if facility_rates and ga_asc_mar:
-                facility_ga_asc_pct = (avg_facility_rate / avg_ga_asc_mar) * 100 if avg_ga_asc_mar > 0 else 0
-            
-            if facility_rates and medicare_opps_mar:
-                facility_medicare_op_pct = (avg_facility_rate / avg_medicare_opps_mar) * 100 if avg_medicare_opps_mar > 0 else 0
-            
-            if facility_rates and medicare_asc_mar:
-                facility_medicare_asc_pct = (avg_facility_rate / avg_medicare_asc_mar) * 100 if avg_medicare_asc_mar > 0 else 0
+            facility_ga_op_pct = (avg_facility_rate / avg_ga_op_mar) * 100 if avg_ga_op_mar > 0 else 0
+            facility_ga_asc_pct = (avg_facility_rate / avg_ga_asc_mar) * 100 if avg_ga_asc_mar > 0 else 0
+            facility_medicare_op_pct = (avg_facility_rate / avg_medicare_opps_mar) * 100 if avg_medicare_opps_mar > 0 else 0
+            facility_medicare_asc_pct = (avg_facility_rate / avg_medicare_asc_mar) * 100 if avg_medicare_asc_mar > 0 else 0
             
             return {
                 'professional': {
@@ -471,7 +544,7 @@ class ParquetDataManager:
                     'ga_prof_pct': round(prof_ga_pct, 2),
                     'medicare_prof_mar': round(avg_prof_medicare, 2),
                     'medicare_prof_pct': round(prof_medicare_pct, 2),
-                    'record_count': len(prof_data),
+                    'record_count': prof_count,
                 },
                 'facility': {
                     'avg_rate': round(avg_facility_rate, 2),
@@ -483,7 +556,7 @@ class ParquetDataManager:
                     'medicare_op_pct': round(facility_medicare_op_pct, 2),
                     'medicare_asc_mar_stateavg': round(avg_medicare_asc_mar, 2),
                     'medicare_asc_pct': round(facility_medicare_asc_pct, 2),
-                    'record_count': len(facility_data),
+                    'record_count': facility_count,
                 }
             }
             
@@ -541,6 +614,60 @@ class ParquetDataManager:
             logger.error(f"Error getting sample records: {str(e)}")
             return []
 
+    @staticmethod
+    def _convert_sample_value(column: str, value: Any) -> Any:
+        """Apply get_sample_records' per-field conversions to a single sample value."""
+        if column in ('rate', 'GA_PROF_MAR', 'medicare_prof'):
+            return float(value) if value else 0
+        if column in ('code_desc', 'primary_taxonomy_desc', 'primary_taxonomy_code', 'tin_value'):
+            return value if value else ''
+        return value
+
+    def get_sample_columns(self, columns=('billing_code', 'org_name', 'rate'),
+                           filters: Optional[Dict[str, Any]] = None, limit: int = 10) -> Dict[str, List[Any]]:
+        """Get sample rows as one list per column, reading only the requested columns."""
+        try:
+            con = self._get_connection()
+            if not con:
+                logger.error("No database connection available")
+                return {column: [] for column in columns}
+            
+            # Build WHERE clause from filters
+            where_sql = self.build_where_clause(filters or {})
+            
+            query = f"""
+                SELECT {', '.join(columns)}
+                FROM commercial_rates
+                WHERE {where_sql}
+                LIMIT {limit}
+            """
+            
+            rows = con.execute(query).fetchall()
+            values = list(zip(*rows)) or [()] * len(columns)
+            return {
+                column: [self._convert_sample_value(column, value) for value in column_values]
+                for column, column_values in zip(columns, values)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting sample columns: {str(e)}")
+            return {column: [] for column in columns}
+
+    def get_overview(self, unique_cols=('payer', 'org_name', 'billing_class'), sample_limit: int = 3,
+                     sample_cols=('billing_code', 'org_name', 'rate'),
+                     filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Get unique values, aggregated stats and sample columns in one call.
+        
+        The unique values for every column come from a single scan instead of one
+        DISTINCT query per column; stats and samples reuse the same connection.
+        """
+        return {
+            'unique': self.get_unique_values_for_columns(list(unique_cols), filters),
+            'stats': self.get_aggregated_stats(filters),
+            'sample': self.get_sample_columns(sample_cols, filters, limit=sample_limit),
+        }
+
     def get_comparison_stats(self, orgs: List[str], payers: List[str]) -> Dict[str, Any]:
         """Get comparison statistics for selected organizations and payers."""
         try:
@@ -1054,3 +1181,9 @@ class ParquetDataManager:
                 'coverage_pct': 0,
                 'efficiency_score': 0
             }
+
+
+@lru_cache(maxsize=32)
+def get_data_manager(file_path: Optional[str] = None, state: Optional[str] = None, npi_type: Optional[str] = None) -> ParquetDataManager:
+    """Get a shared ParquetDataManager for a data file, constructing it once per argument set."""
+    return ParquetDataManager(file_path=file_path, state=state, npi_type=npi_type)
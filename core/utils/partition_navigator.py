@@ -1,5 +1,6 @@
 import sqlite3
 import pandas as pd
+import pyarrow.parquet as pq
 import boto3
 import io
 from typing import Dict, List, Optional, Any
@@ -13,10 +14,10 @@ logger = logging.getLogger(__name__)
 
 # Import Medicare benchmark lookup
 try:
-    from .medicare_benchmarks import MedicareBenchmarkLookup
+    from .medicare_benchmarks import get_medicare_lookup
 except ImportError:
     logger.warning("MedicareBenchmarkLookup not available - benchmark calculations will be skipped")
-    MedicareBenchmarkLookup = None
+    get_medicare_lookup = None
 
 class PartitionNavigator:
     """
@@ -32,11 +33,11 @@ class PartitionNavigator:
         self.conn = None
         self.s3_client = None
         
-        # Initialize Medicare benchmark lookup
+        # Shared Medicare benchmark lookup, so its cached parquet data outlives the request
         self.medicare_lookup = None
-        if MedicareBenchmarkLookup:
+        if get_medicare_lookup:
             try:
-                self.medicare_lookup = MedicareBenchmarkLookup()
+                self.medicare_lookup = get_medicare_lookup()
                 logger.info("Medicare benchmark lookup initialized successfully")
             except Exception as e:
                 logger.warning(f"Failed to initialize Medicare benchmark lookup: {e}")
@@ -338,25 +339,20 @@ class PartitionNavigator:
         
         logger.info(f"Processing {len(unique_combinations)} unique combinations for benchmark lookups")
         
-        # Batch process professional rates
-        prof_rates_cache = {}
+        # Batch process professional rates (state averages over one shared connection)
+        prof_pairs = [(code, location) for combo_type, code, location in unique_combinations if combo_type == 'prof']
+        prof_rates_cache = self.medicare_lookup.get_professional_rates_state_avg(prof_pairs)
         inst_rates_cache = {}
         
         for combo_type, code, location in unique_combinations:
+            if combo_type != 'inst':
+                continue
             try:
-                if combo_type == 'prof':
-                    # Use state average instead of ZIP-specific rate
-                    rate = self.medicare_lookup.get_professional_rate_state_avg(code, location)
-                    prof_rates_cache[(code, location)] = rate
-                elif combo_type == 'inst':
-                    rates = self.medicare_lookup.get_institutional_rates(code, location)
-                    inst_rates_cache[(code, location)] = rates
+                rates = self.medicare_lookup.get_institutional_rates(code, location)
+                inst_rates_cache[(code, location)] = rates
             except Exception as e:
                 logger.warning(f"Error getting benchmark rates for {code} in {location}: {e}")
-                if combo_type == 'prof':
-                    prof_rates_cache[(code, location)] = None
-                elif combo_type == 'inst':
-                    inst_rates_cache[(code, location)] = {'medicare_asc_stateavg': None, 'medicare_opps_stateavg': None}
+                inst_rates_cache[(code, location)] = {'medicare_asc_stateavg': None, 'medicare_opps_stateavg': None}
         
         # Apply cached rates to DataFrame
         def get_prof_rate(row):
@@ -455,8 +451,12 @@ class PartitionNavigator:
         
         return df, benchmark_stats
     
-    def combine_partitions_for_analysis(self, partition_paths: List[str], max_rows: int = 10000, progress_callback=None, columns=None) -> Optional[pd.DataFrame]:
-        """Combine multiple partitions in memory for analysis with progress tracking"""
+    def combine_partitions_for_analysis(self, partition_paths: List[str], max_rows: int = 10000, progress_callback=None, columns=None, include_metadata: bool = True) -> Optional[pd.DataFrame]:
+        """Combine multiple partitions in memory for analysis with progress tracking
+        
+        With include_metadata=False, '_'-prefixed columns are neither read from the
+        parquet files nor added as partition metadata (used for raw data exports).
+        """
         if not partition_paths:
             return None
         
@@ -494,13 +494,19 @@ class PartitionNavigator:
                     # Convert to DataFrame (only load specified columns if provided)
                     if columns:
                         df = pd.read_parquet(io.BytesIO(parquet_data), columns=columns)
+                    elif not include_metadata:
+                        # Project metadata columns away at read time instead of decoding them
+                        schema_names = pq.ParquetFile(io.BytesIO(parquet_data)).schema_arrow.names
+                        data_columns = [name for name in schema_names if not name.startswith('_')]
+                        df = pd.read_parquet(io.BytesIO(parquet_data), columns=data_columns)
                     else:
                         df = pd.read_parquet(io.BytesIO(parquet_data))
                     
                     # Add partition metadata
-                    df['_partition_source'] = s3_path
-                    df['_partition_index'] = i
-                    df['_load_timestamp'] = time.time()
+                    if include_metadata:
+                        df['_partition_source'] = s3_path
+                        df['_partition_index'] = i
+                        df['_load_timestamp'] = time.time()
                     
                     combined_dfs.append(df)
                     total_rows += len(df)
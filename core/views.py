@@ -1,5 +1,6 @@
 import json
 import logging
+import math
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.http import JsonResponse, HttpResponse
@@ -371,6 +372,9 @@ def commercial_rate_insights_state(request, state_code):
     State-specific Commercial Rate Insights Dashboard
     Displays interactive visualizations and analysis for a specific state
     """
+    # Reported to clients in the X-Cache header
+    cache_status = 'MISS'
+    
     try:
         # Validate state code
         state_code = state_code.upper()
@@ -431,6 +435,7 @@ def commercial_rate_insights_state(request, state_code):
         cached_data = cache.get(cache_key)
         if cached_data:
             logger.info(f"Using cached data for {state_code}")
+            cache_status = 'HIT'
             context = cached_data
             # Add NPI type to cached context if not present
             if 'npi_type' not in context:
@@ -507,7 +512,9 @@ def commercial_rate_insights_state(request, state_code):
             'state_name': ParquetDataManager.get_state_name(state_code)
         }
     
-    return render(request, 'core/commercial_rate_insights_state.html', context)
+    response = render(request, 'core/commercial_rate_insights_state.html', context)
+    response['X-Cache'] = cache_status
+    return response
 
 
 @login_required
@@ -2577,6 +2584,19 @@ def rate_analyzer(request):
     return render(request, 'core/rate_analyzer.html', context)
 
 
+def _get_taxonomy_key(value):
+    """Convert a primary_taxonomy_code cell into a sorted, comma-joined key (None when unknown)"""
+    if value is None or isinstance(value, str) or not hasattr(value, '__iter__'):
+        value = [value]
+    codes = [str(code) for code in value if code is not None and pd.notna(code) and code != '']
+    return ', '.join(sorted(codes)) if codes else None
+
+
+def _get_rate_fields(rate_cols, values):
+    """Pair rate column names with plain float values, mapping NaN to None"""
+    return {col: None if math.isnan(value) else value for col, value in zip(rate_cols, values)}
+
+
 @login_required
 def tile_analyzer(request):
     """
@@ -2673,6 +2693,8 @@ def tile_analyzer(request):
                         metrics['npi'] = {'count': 0, 'values': []}
                     
                     # Taxonomy codes - cross-reference with dim_taxonomy
+                    # (taxonomy_map is reused for the chart display names below)
+                    taxonomy_map = {}
                     if 'primary_taxonomy_code' in df.columns:
                         try:
                             # Get unique taxonomy codes
@@ -2722,122 +2744,104 @@ def tile_analyzer(request):
                     # Prepare chart data grouped by network_pattern_id
                     chart_data = {}
                     if 'network_pattern_id' in df.columns and 'billing_code' in df.columns:
-                        import sqlite3
-                        import pandas as pd
-                        import json
-                        dims_db_path = Path(__file__).resolve().parent / 'data' / 'dims.sqlite'
-                        
                         # Get distinct network patterns
                         network_patterns = sorted(df['network_pattern_id'].dropna().unique())
                         
-                        for network_id in network_patterns:
-                            network_df = df[df['network_pattern_id'] == network_id].copy()
+                        # Billing code frequencies for every network in one pass
+                        # (index comes back sorted, so it doubles as the dropdown list)
+                        code_counts = df.groupby(['network_pattern_id', 'billing_code'], observed=True).size()
+                        
+                        # Canonical taxonomy key for every row (None when unknown)
+                        has_taxonomy = 'primary_taxonomy_code' in df.columns
+                        if has_taxonomy:
+                            df['taxonomy_key'] = df['primary_taxonomy_code'].map(_get_taxonomy_key)
+                        
+                        # Aggregate rates once for every (network, code[, taxonomy]) combination;
+                        # the per-network summaries below only do index lookups into these frames
+                        code_keys = ['network_pattern_id', 'billing_code']
+                        rate_cols = ['negotiated_rate', 'prof_medicare', 'asc_medicare', 'opps_medicare']
+                        if has_taxonomy:
+                            taxonomy_rates = df.groupby(code_keys + ['taxonomy_key'], observed=True)[rate_cols].mean()
+                            unknown_rates = df[df['taxonomy_key'].isna()].groupby(code_keys, observed=True)[rate_cols].mean()
+                        else:
+                            code_rates = df.groupby(code_keys, observed=True)[rate_cols].mean()
+                        
+                        # First non-null name for each code
+                        code_names = df.dropna(subset=['name']).groupby(code_keys, observed=True)['name'].first() if 'name' in df.columns else pd.Series(dtype=object)
+                        
+                        def summarize_network(network_id):
+                            """Build the chart entry for one network pattern"""
+                            network_counts = code_counts.loc[network_id] if network_id in code_counts.index else code_counts.iloc[:0]
                             
                             # Get top 5 billing codes by frequency
-                            top_codes = network_df['billing_code'].value_counts().head(5).index.tolist()
+                            top_codes = network_counts.sort_values(ascending=False, kind='stable').head(5).index.tolist()
                             
                             # Get all unique billing codes for dropdown
-                            all_codes = sorted(network_df['billing_code'].dropna().unique().tolist())
+                            all_codes = network_counts.index.tolist()
                             
                             # Prepare data for each billing code
                             code_data = []
                             for code in top_codes:
-                                code_df = network_df[network_df['billing_code'] == code]
-                                
-                                # Get the name field (first non-null value for this code)
-                                code_name = None
-                                if 'name' in code_df.columns:
-                                    code_name = code_df['name'].dropna().iloc[0] if len(code_df['name'].dropna()) > 0 else None
+                                code_name = code_names.get((network_id, code))
                                 
-                                # Group by taxonomy to find rate variations
-                                if 'primary_taxonomy_code' in code_df.columns:
-                                    # Convert array to hashable tuple for grouping
-                                    code_df_copy = code_df.copy()
-                                    code_df_copy['taxonomy_key'] = code_df_copy['primary_taxonomy_code'].apply(
-                                        lambda x: tuple(sorted(x)) if isinstance(x, (list, pd.Series)) else (tuple(x) if hasattr(x, '__iter__') and not isinstance(x, str) else (x,))
-                                    )
-                                    
-                                    # Get unique taxonomy combinations and their rates
-                                    taxonomy_groups = code_df_copy.groupby('taxonomy_key').agg({
-                                        'negotiated_rate': 'mean',
-                                        'prof_medicare': lambda x: x.dropna().mean() if x.notna().any() else None,
-                                        'asc_medicare': lambda x: x.dropna().mean() if x.notna().any() else None,
-                                        'opps_medicare': lambda x: x.dropna().mean() if x.notna().any() else None,
-                                    }).reset_index()
+                                # Rate variations by taxonomy
+                                if has_taxonomy:
+                                    code_taxonomy_rates = taxonomy_rates.loc[(network_id, code)] if (network_id, code) in taxonomy_rates.index else taxonomy_rates.iloc[:0]
                                     
-                                    # Get taxonomy display names from the tuple keys
-                                    all_taxonomy_codes = set()
-                                    for taxonomy_tuple in taxonomy_groups['taxonomy_key']:
-                                        if taxonomy_tuple and taxonomy_tuple != (None,):
-                                            all_taxonomy_codes.update(taxonomy_tuple)
-                                    
-                                    taxonomy_codes = list(all_taxonomy_codes)
-                                    if taxonomy_codes:
-                                        conn = sqlite3.connect(str(dims_db_path))
-                                        cursor = conn.cursor()
-                                        placeholders = ','.join(['?' for _ in taxonomy_codes])
-                                        query = f'SELECT Code, "Display Name" FROM dim_taxonomy WHERE Code IN ({placeholders})'
-                                        cursor.execute(query, taxonomy_codes)
-                                        taxonomy_map = {row[0]: row[1] for row in cursor.fetchall()}
-                                        conn.close()
-                                    else:
-                                        taxonomy_map = {}
-                                    
-                                    # Convert to list of dicts
-                                    for _, row in taxonomy_groups.iterrows():
-                                        taxonomy_tuple = row['taxonomy_key']
-                                        
-                                        # Create display name from tuple of taxonomy codes
-                                        if taxonomy_tuple and taxonomy_tuple != (None,):
-                                            display_parts = [taxonomy_map.get(code, code) for code in taxonomy_tuple if code]
-                                            taxonomy_display = ', '.join(display_parts[:3])  # Limit to 3 for readability
-                                            if len(display_parts) > 3:
-                                                taxonomy_display += f' +{len(display_parts)-3} more'
-                                            taxonomy_code_str = ', '.join(str(c) for c in taxonomy_tuple if c)
-                                        else:
-                                            taxonomy_display = 'Unknown'
-                                            taxonomy_code_str = None
+                                    # Convert to list of dicts (display names come from the taxonomy_map loaded above);
+                                    # rates are pulled out as one float array instead of iterrows()
+                                    rate_rows = code_taxonomy_rates[rate_cols].to_numpy(dtype=float).tolist()
+                                    for taxonomy_key, rate_values in zip(code_taxonomy_rates.index, rate_rows):
+                                        # Create display name from the taxonomy codes in the key
+                                        display_parts = [taxonomy_map.get(c, c) for c in taxonomy_key.split(', ')]
+                                        taxonomy_display = ', '.join(display_parts[:3])  # Limit to 3 for readability
+                                        if len(display_parts) > 3:
+                                            taxonomy_display += f' +{len(display_parts)-3} more'
                                         
                                         code_data.append({
                                             'billing_code': code,
                                             'name': code_name,
-                                            'taxonomy_code': taxonomy_code_str,
+                                            'taxonomy_code': taxonomy_key,
                                             'taxonomy_display': taxonomy_display,
-                                            'negotiated_rate': float(row['negotiated_rate']) if pd.notna(row['negotiated_rate']) else None,
-                                            'prof_medicare': float(row['prof_medicare']) if pd.notna(row['prof_medicare']) else None,
-                                            'asc_medicare': float(row['asc_medicare']) if pd.notna(row['asc_medicare']) else None,
-                                            'opps_medicare': float(row['opps_medicare']) if pd.notna(row['opps_medicare']) else None,
+                                            **_get_rate_fields(rate_cols, rate_values),
+                                        })
+                                    
+                                    # Rows without a taxonomy collapse into a single "Unknown" entry
+                                    if (network_id, code) in unknown_rates.index:
+                                        code_data.append({
+                                            'billing_code': code,
+                                            'name': code_name,
+                                            'taxonomy_code': None,
+                                            'taxonomy_display': 'Unknown',
+                                            **_get_rate_fields(rate_cols, unknown_rates.loc[(network_id, code), rate_cols].to_numpy(dtype=float).tolist()),
                                         })
                                 else:
                                     # No taxonomy differentiation
-                                    avg_rates = code_df.agg({
-                                        'negotiated_rate': 'mean',
-                                        'prof_medicare': lambda x: x.dropna().mean() if x.notna().any() else None,
-                                        'asc_medicare': lambda x: x.dropna().mean() if x.notna().any() else None,
-                                        'opps_medicare': lambda x: x.dropna().mean() if x.notna().any() else None,
-                                    })
-                                    
                                     code_data.append({
                                         'billing_code': code,
                                         'name': code_name,
                                         'taxonomy_code': None,
                                         'taxonomy_display': 'All Taxonomies',
-                                        'negotiated_rate': float(avg_rates['negotiated_rate']) if pd.notna(avg_rates['negotiated_rate']) else None,
-                                        'prof_medicare': float(avg_rates['prof_medicare']) if pd.notna(avg_rates['prof_medicare']) else None,
-                                        'asc_medicare': float(avg_rates['asc_medicare']) if pd.notna(avg_rates['asc_medicare']) else None,
-                                        'opps_medicare': float(avg_rates['opps_medicare']) if pd.notna(avg_rates['opps_medicare']) else None,
+                                        **_get_rate_fields(rate_cols, code_rates.loc[(network_id, code), rate_cols].to_numpy(dtype=float).tolist()),
                                     })
                             
-                            chart_data[str(network_id)] = {
+                            return network_id, {
                                 'network_id': str(network_id),
                                 'top_codes': top_codes,
                                 'all_codes': all_codes,
                                 'data': code_data
                             }
+                        
+                        chart_data = {
+                            str(network_id): network_entry
+                            for network_id, network_entry in map(summarize_network, network_patterns)
+                        }
                     
-                    # Pass chart_data directly (Django templates can handle Python dicts/lists)
+                    # chart_data drives the HTML loops; the chart scripts read the
+                    # pre-serialized copy so the template never re-encodes it
                     context['metrics'] = metrics
                     context['chart_data'] = chart_data
+                    context['chart_data_json'] = json.dumps(chart_data, default=str, separators=(',', ':'))
                     context['billing_class'] = request.GET.get('billing_class', '')
                     logger.info(f"Calculated metrics for tile: analyzed {len(df)} rows with {len(chart_data)} network patterns")
                     
@@ -2911,17 +2915,13 @@ def tile_analyzer_download_csv(request):
         logger.info(f"Fetching data from {len(parquet_files)} parquet file(s)")
         df = navigator.combine_partitions_for_analysis(
             partition_paths=parquet_files,
-            max_rows=100000  # Limit to 100k rows for performance
+            max_rows=100000,  # Limit to 100k rows for performance
+            include_metadata=False  # Internal '_' columns are never read for the export
         )
         
         if df is None or df.empty:
             return HttpResponse("No data found in partition", status=404)
         
-        # Remove internal metadata columns
-        metadata_cols = [col for col in df.columns if col.startswith('_')]
-        if metadata_cols:
-            df = df.drop(columns=metadata_cols)
-        
         # Create CSV response
         response = HttpResponse(content_type='text/csv')
         
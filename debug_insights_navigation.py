@@ -8,6 +8,7 @@ import os
 import sys
 import time
 import json
+import http.cookiejar
 import urllib.request
 import urllib.parse
 import urllib.error
@@ -18,30 +19,21 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 class InsightsNavigationDebugger:
     def __init__(self, base_url="http://localhost:8000"):
         self.base_url = base_url
-        self.cookie_jar = {}
+        # Cookie jar + opener built once; the cookie processor handles
+        # Set-Cookie parsing and domain/path/expiry matching per request
+        self.cookie_jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookie_jar))
     
     def make_request(self, url, timeout=30):
         """Make HTTP request using urllib"""
         try:
             req = urllib.request.Request(url)
             
-            # Add cookies if we have them
-            if self.cookie_jar:
-                cookie_header = '; '.join([f"{k}={v}" for k, v in self.cookie_jar.items()])
-                req.add_header('Cookie', cookie_header)
-            
             start_time = time.time()
-            with urllib.request.urlopen(req, timeout=timeout) as response:
+            with self.opener.open(req, timeout=timeout) as response:
                 end_time = time.time()
                 content = response.read().decode('utf-8')
                 
-                # Store cookies from response
-                if 'Set-Cookie' in response.headers:
-                    for cookie in response.headers.get_all('Set-Cookie'):
-                        if '=' in cookie:
-                            key, value = cookie.split('=', 1)
-                            self.cookie_jar[key] = value.split(';')[0]
-                
                 return {
                     'status_code': response.status,
                     'content': content,
@@ -263,7 +255,9 @@ class InsightsNavigationDebugger:
 if __name__ == "__main__":
     # Check if server is running
     try:
-        response = requests.get("http://localhost:8000", timeout=5)
+        # HEAD only confirms the server answers; the home page body is never transferred
+        request = urllib.request.Request("http://localhost:8000/", method="HEAD")
+        urllib.request.urlopen(request, timeout=5).close()
         print("✅ Server is running")
     except:
         print("❌ Server is not running. Please start the Django server first.")
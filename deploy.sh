@@ -34,6 +34,10 @@ uv run python manage.py migrate
 echo "📁 Collecting static files..."
 uv run python manage.py collectstatic --noinput
 
+# Build the Arrow IPC copies of the Medicare benchmark files
+echo "📊 Building benchmark Arrow copies..."
+uv run python manage.py build_benchmark_arrow
+
 # Restart services
 echo "🔄 Restarting services..."
 sudo systemctl restart workcomp-rates
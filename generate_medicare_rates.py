@@ -4,100 +4,155 @@ Simple script to generate Medicare professional rates table.
 Uses 3 simple queries:
 1. Get distinct state codes
 2. Get distinct procedure codes  
-3. Run the state average query for each combination
+3. Load RVUs and state GPCIs once and compute every combination with NumPy
 """
 
 import sqlite3
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-import os
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 
-def get_distinct_states():
-    """Get all distinct state codes from medicare_locality_map."""
-    db_path = os.path.join(
-        Path(__file__).resolve().parent,
-        'core', 'data', 'benchmarks',
-        'benchmarks.db'
-    )
-    
-    with sqlite3.connect(db_path) as conn:
+# Resolved once at import; every helper builds its paths from here
+BENCHMARKS_DIR = Path(__file__).resolve().parent / 'core' / 'data' / 'benchmarks'
+DB_PATH = str(BENCHMARKS_DIR / 'benchmarks.db')
+
+# Output layout of the rates table; labels are dictionary-encoded, rates fit in float32
+RATES_SCHEMA = pa.schema([
+    ('procedure_code', pa.string()),
+    ('state_code', pa.dictionary(pa.int16(), pa.string())),
+    ('year', pa.int16()),
+    ('medicare_professional_rate', pa.float32()),
+    ('rate_type', pa.dictionary(pa.int8(), pa.string())),
+])
+# Rows per streamed batch; each batch is written as exactly one parquet row group
+ROW_GROUP_ROWS = 1_000_000
+
+def connect_benchmarks_db():
+    """Open the benchmarks database once, tuned for a read-heavy batch run."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.executescript("""
+        PRAGMA temp_store = MEMORY;
+        PRAGMA cache_size = -200000;
+        PRAGMA mmap_size = 268435456;
+    """)
+    return conn
+
+def _first_column(cursor, row):
+    """Row factory for single-column queries: yield the bare value instead of a tuple."""
+    return row[0]
+
+def _fetch_first_column(db_path, query):
+    """Run a single-column query on its own connection and return the values as a tuple."""
+    conn = sqlite3.connect(db_path)
+    try:
         cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT state_code FROM medicare_locality_map ORDER BY state_code")
-        return [row[0] for row in cursor.fetchall()]
+        cursor.row_factory = _first_column
+        cursor.execute(query)
+        return tuple(cursor.fetchall())
+    finally:
+        conn.close()
+
+@lru_cache(maxsize=1)
+def _distinct_states(db_path):
+    return _fetch_first_column(db_path, "SELECT DISTINCT state_code FROM medicare_locality_map ORDER BY state_code")
+
+@lru_cache(maxsize=1)
+def _distinct_procedure_codes(db_path):
+    return _fetch_first_column(db_path, """
+        SELECT DISTINCT procedure_code
+        FROM cms_rvu
+        WHERE procedure_code IS NOT NULL
+        AND procedure_code != ''
+        AND (modifier IS NULL OR modifier = '')
+        ORDER BY procedure_code
+    """)
+
+def get_distinct_states():
+    """Get all distinct state codes from medicare_locality_map (cached for the current DB_PATH)."""
+    # DB_PATH is read at call time, like connect_benchmarks_db, so repointing it takes effect
+    return _distinct_states(DB_PATH)
 
 def get_distinct_procedure_codes():
-    """Get all distinct procedure codes from cms_rvu."""
-    db_path = os.path.join(
-        Path(__file__).resolve().parent,
-        'core', 'data', 'benchmarks',
-        'benchmarks.db'
-    )
+    """Get all distinct procedure codes from cms_rvu (cached for the current DB_PATH)."""
+    return _distinct_procedure_codes(DB_PATH)
+
+def build_state_locality_gpci(conn, year=2025):
+    """Materialize the procedure-independent locality/GPCI/conversion factor join as a temp table."""
+    conn.execute("DROP TABLE IF EXISTS temp.state_locality_gpci")
+    conn.execute("""
+        CREATE TEMP TABLE state_locality_gpci AS
+        SELECT
+            mloc.state_code,
+            gpci.year,
+            COALESCE(gpci.work_gpci, 0) AS work_gpci,
+            COALESCE(gpci.pe_gpci, 0) AS pe_gpci,
+            COALESCE(gpci.mp_gpci, 0) AS mp_gpci,
+            COALESCE(cf.conversion_factor, 0) AS conversion_factor
+        FROM
+            medicare_locality_map mloc
+        JOIN
+            medicare_locality_meta meta
+            ON mloc.carrier_code = meta.mac_code
+            AND mloc.locality_code = meta.locality_code
+        JOIN
+            cms_gpci gpci
+            ON TRIM(meta.fee_schedule_area) = TRIM(gpci.locality_name)
+            AND mloc.locality_code = gpci.locality_code
+        JOIN
+            cms_conversion_factor cf
+            ON gpci.year = cf.year
+        WHERE
+            gpci.year = ?
+    """, (year,))
+    conn.execute("CREATE INDEX temp.idx_slg_state ON state_locality_gpci(state_code)")
     
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT procedure_code
-            FROM cms_rvu
-            WHERE procedure_code IS NOT NULL
-            AND procedure_code != ''
-            AND (modifier IS NULL OR modifier = '')
-            ORDER BY procedure_code
-        """)
-        return [row[0] for row in cursor.fetchall()]
+    # Per-state mean of GPCI x conversion factor, computed inside SQLite
+    conn.execute("DROP VIEW IF EXISTS temp.state_scaled_gpci")
+    conn.execute("""
+        CREATE TEMP VIEW state_scaled_gpci AS
+        SELECT
+            state_code,
+            AVG(work_gpci * conversion_factor) AS work_gpci,
+            AVG(pe_gpci * conversion_factor) AS pe_gpci,
+            AVG(mp_gpci * conversion_factor) AS mp_gpci
+        FROM state_locality_gpci
+        GROUP BY state_code
+    """)
 
-def get_state_avg_rate(procedure_code, state_code, year=2025):
-    """Get state average rate for a specific procedure code and state."""
-    db_path = os.path.join(
-        Path(__file__).resolve().parent,
-        'core', 'data', 'benchmarks',
-        'benchmarks.db'
-    )
+def get_state_avg_rates(conn, year=2025):
+    """Get a procedure x state matrix of state average rates from two pre-aggregated queries."""
+    build_state_locality_gpci(conn, year)
     
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT
-                AVG(
-                    (
-                        (
-                            COALESCE(rvu.work_rvu, 0) * COALESCE(gpci.work_gpci, 0) +
-                            COALESCE(rvu.practice_expense_rvu, 0) * COALESCE(gpci.pe_gpci, 0) +
-                            COALESCE(rvu.malpractice_rvu, 0) * COALESCE(gpci.mp_gpci, 0)
-                        ) * COALESCE(cf.conversion_factor, 0)
-                    )
-                ) AS state_avg_allowed_amount
-            FROM
-                medicare_locality_map mloc
-            JOIN
-                medicare_locality_meta meta
-                ON mloc.carrier_code = meta.mac_code
-                AND mloc.locality_code = meta.locality_code
-            JOIN
-                cms_gpci gpci
-                ON TRIM(meta.fee_schedule_area) = TRIM(gpci.locality_name)
-                AND mloc.locality_code = gpci.locality_code
-            JOIN
-                cms_rvu rvu
-                ON 1=1
-            JOIN
-                cms_conversion_factor cf
-                ON gpci.year = cf.year
-            WHERE
-                mloc.state_code = ?
-                AND gpci.year = ?
-                AND rvu.year = ?
-                AND rvu.procedure_code = ?
-                AND (rvu.modifier IS NULL OR rvu.modifier = '')
-        """, (state_code, year, year, procedure_code))
-        
-        result = cursor.fetchone()
-        return result[0] if result and result[0] is not None else None
+    # The average over every (RVU row, locality row) pair is bilinear, so it factors into
+    # the procedure's mean RVU vector dotted with the state's mean GPCI * conversion factor;
+    # SQLite reduces both sides and only the final matrix product happens in NumPy
+    proc_rvu = pd.read_sql_query("""
+        SELECT
+            procedure_code,
+            AVG(COALESCE(work_rvu, 0)) AS work_rvu,
+            AVG(COALESCE(practice_expense_rvu, 0)) AS practice_expense_rvu,
+            AVG(COALESCE(malpractice_rvu, 0)) AS malpractice_rvu
+        FROM cms_rvu
+        WHERE year = ?
+        AND (modifier IS NULL OR modifier = '')
+        GROUP BY procedure_code
+    """, conn, params=(year,), index_col='procedure_code')
+    state_gpci = pd.read_sql_query("SELECT * FROM state_scaled_gpci", conn, index_col='state_code')
+    
+    rates = proc_rvu.to_numpy() @ state_gpci.to_numpy().T
+    return pd.DataFrame(rates, index=proc_rvu.index, columns=state_gpci.index)
 
 def main():
     """Generate Medicare professional rates table."""
     print("Generating Medicare Professional Rates Table")
     print("=" * 50)
     
+    # One connection serves every query in the run
+    conn = connect_benchmarks_db()
+    
     # Step 1: Get distinct state codes
     print("1. Getting distinct state codes...")
     states = get_distinct_states()
@@ -108,53 +163,57 @@ def main():
     procedure_codes = get_distinct_procedure_codes()
     print(f"   Found {len(procedure_codes)} procedure codes: {', '.join(procedure_codes[:10])}{'...' if len(procedure_codes) > 10 else ''}")
     
-    # Step 3: Generate combinations and calculate rates
+    # Step 3: Calculate rates for all combinations in a single grouped query
     print("3. Calculating state average rates...")
-    results = []
-    total_combinations = len(states) * len(procedure_codes)
-    processed = 0
+    rates = get_state_avg_rates(conn)
+    conn.close()
     
-    for procedure_code in procedure_codes:
-        for state_code in states:
-            rate = get_state_avg_rate(procedure_code, state_code)
-            
-            results.append({
-                'procedure_code': procedure_code,
-                'state_code': state_code,
-                'year': 2025,
-                'medicare_professional_rate': rate,
-                'rate_type': 'state_average'
-            })
-            
-            processed += 1
-            if processed % 1000 == 0:
-                print(f"   Processed {processed}/{total_combinations} combinations...")
-    
-    # Create DataFrame and save to parquet
-    df = pd.DataFrame(results)
+    # Align the matrix to the full procedure x state grid (pairs without data stay NaN)
+    rates = rates.reindex(index=procedure_codes, columns=states)
+    rate_matrix = rates.to_numpy(dtype=np.float32)
     
     # Save to parquet file
-    output_path = os.path.join(
-        Path(__file__).resolve().parent,
-        'core', 'data', 'benchmarks',
-        'medicare_professional_rates.parquet'
-    )
+    output_path = str(BENCHMARKS_DIR / 'medicare_professional_rates.parquet')
     
-    df.to_parquet(output_path, index=False)
+    # Stream the long-form table out a batch of procedure codes at a time, so only one
+    # batch is ever materialized; narrow types and dictionary-encoded labels keep it small
+    state_dictionary = pa.array(states, type=pa.string())
+    rate_type_dictionary = pa.array(['state_average'], type=pa.string())
+    state_indices = np.arange(len(states), dtype=np.int16)
+    batch_procedures = max(1, ROW_GROUP_ROWS // max(1, len(states)))
+    sample = None
+    
+    with pq.ParquetWriter(output_path, RATES_SCHEMA, compression='zstd', compression_level=7) as writer:
+        for start in range(0, len(procedure_codes), batch_procedures):
+            batch_codes = procedure_codes[start:start + batch_procedures]
+            batch_rows = len(batch_codes) * len(states)
+            table = pa.Table.from_arrays([
+                pa.array(np.repeat(batch_codes, len(states)), type=pa.string()),
+                pa.DictionaryArray.from_arrays(np.tile(state_indices, len(batch_codes)), state_dictionary),
+                pa.array(np.full(batch_rows, 2025, dtype=np.int16)),
+                pa.array(rate_matrix[start:start + batch_procedures].ravel(), from_pandas=True),
+                pa.DictionaryArray.from_arrays(np.zeros(batch_rows, dtype=np.int8), rate_type_dictionary),
+            ], schema=RATES_SCHEMA).combine_chunks()
+            writer.write_table(table, row_group_size=table.num_rows)
+            
+            if sample is None:
+                sample = table.slice(0, 1000).to_pandas().dropna(subset=['medicare_professional_rate'])
     
     # Summary
-    valid_rates = df[df['medicare_professional_rate'].notna()]
-    print(f"\n[SUCCESS] Generated table with {len(results)} records")
-    print(f"  Valid rates: {len(valid_rates)}")
+    total_records = rate_matrix.size
+    valid_count = int(np.count_nonzero(~np.isnan(rate_matrix)))
+    print(f"\n[SUCCESS] Generated table with {total_records} records")
+    print(f"  Valid rates: {valid_count}")
     print(f"  Output: {output_path}")
     
-    if len(valid_rates) > 0:
-        min_rate = valid_rates['medicare_professional_rate'].min()
-        max_rate = valid_rates['medicare_professional_rate'].max()
+    if valid_count > 0:
+        min_rate = np.nanmin(rate_matrix)
+        max_rate = np.nanmax(rate_matrix)
         print(f"  Rate range: ${min_rate:.2f} - ${max_rate:.2f}")
     
     print(f"\nSample data:")
-    print(valid_rates.head().to_string(index=False))
+    if sample is not None:
+        print(sample.head().to_string(index=False))
 
 if __name__ == "__main__":
     main()
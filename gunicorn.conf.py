@@ -6,15 +6,21 @@ bind = "127.0.0.1:8000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
-worker_connections = 1000
+# Threaded workers: requests mostly wait on S3/SQLite I/O, so a few threads per
+# process keep concurrency without paying a full preloaded app copy per slot.
+# Shared state must be thread-safe: ParquetDataManager hands each thread its own
+# DuckDB cursor rather than the pooled connection
+workers = multiprocessing.cpu_count()
+worker_class = "gthread"
+threads = 8
 timeout = 30
 keepalive = 2
 
-# Restart workers after this many requests, to help prevent memory leaks
-max_requests = 1000
-max_requests_jitter = 50
+# Restart workers after this many requests, to help prevent memory leaks.
+# Respawns reload the benchmark data, so recycle rarely and stagger restarts
+# (jitter ~10%) so workers don't cold-start together; set to 0 if RSS stays flat
+max_requests = 10000
+max_requests_jitter = 1000
 
 # Logging
 accesslog = "/var/log/workcomp-rates/gunicorn_access.log"
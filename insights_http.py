@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP session and test helpers for the insights test scripts
+Importing scripts reuse one keep-alive connection pool instead of each warming up their own,
+and subclass InsightsTestClient for the request, URL and result-file helpers
+"""
+
+import json
+import os
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+# Concurrency comes from a pool of HTTP/1.1 connections: neither runserver nor
+# gunicorn speaks HTTP/2, so a multiplexing client would fall back to this anyway.
+# pool_maxsize must cover the widest concurrency (the fix-validation smoke phases
+# running side by side, ~20 in-flight requests) or urllib3 discards the surplus
+# connections ("Connection pool is full") and reopens them
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=Retry(total=0))
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
+# Advertise every encoding urllib3 can decode here: gzip/deflate always, plus br and
+# zstd when brotli / zstandard are installed. Offering br without a decoder would hand
+# back bodies we cannot read, so the list follows the installed codecs
+SESSION.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+# Worker threads used to issue a test's requests concurrently
+MAX_WORKERS = 8
+
+# Read size when streaming bodies that are only measured or discarded, never kept
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+
+class InsightsTestClient:
+    """Request, URL and result-file helpers shared by the insights test scripts"""
+    
+    # Where _save_results() writes; each script sets its own file
+    results_file = "insights_test_results.json"
+    
+    def __init__(self, base_url="http://localhost:8000"):
+        self.base_url = base_url
+        # One pooled session shared by every test, worker thread and insights script
+        self.session = SESSION
+        self.results = []
+        # Insights page URL per state, interpolated once and reused by every request
+        self._state_base_urls = {}
+    
+    def _timed_get(self, url):
+        """GET a URL on the shared session, discarding the body; returns (elapsed seconds, response, error)"""
+        try:
+            start_time = time.perf_counter()
+            # Drain the body chunk by chunk and let the context manager release the connection,
+            # so the returned response holds only status, headers and timing
+            with self.session.get(url, timeout=30, stream=True) as response:
+                for _ in response.iter_content(RESPONSE_CHUNK_SIZE):
+                    pass
+            return time.perf_counter() - start_time, response, None
+        except Exception as e:
+            return None, None, e
+        
+    def _timed_size(self, url):
+        """GET a URL and count its body bytes chunk by chunk; returns (elapsed seconds, size, content encoding, error)"""
+        try:
+            start_time = time.perf_counter()
+            with self.session.get(url, timeout=30, stream=True) as response:
+                size = sum(len(chunk) for chunk in response.iter_content(RESPONSE_CHUNK_SIZE))
+                encoding = response.headers.get("Content-Encoding", "identity")
+            return time.perf_counter() - start_time, size, encoding, None
+        except Exception as e:
+            return None, None, None, e
+        
+    def _run_n(self, url, n):
+        """GET a URL n times in a row; returns the list of _timed_get probes"""
+        return [self._timed_get(url) for _ in range(n)]
+    
+    def _state_base_url(self, state_code):
+        """Insights page URL for a state, memoized per state code"""
+        base_url = self._state_base_urls.get(state_code)
+        if base_url is None:
+            base_url = self._state_base_urls[state_code] = f"{self.base_url}/commercial/insights/{state_code}/"
+        return base_url
+    
+    def _build_url(self, state_code, filters=None):
+        """Build the insights URL for a state, URL-encoding any filters ({name: [values]})"""
+        base_url = self._state_base_url(state_code)
+        query = urlencode(filters or {}, doseq=True)
+        return f"{base_url}?{query}" if query else base_url
+    
+    def _build_urls(self, state_code, filter_combinations):
+        """Precompute the insights URL for each filter combination"""
+        return [self._build_url(state_code, filter_combo) for filter_combo in filter_combinations]
+    
+    def _save_results(self, results):
+        """Write the results collected so far, replacing the previous snapshot atomically"""
+        tmp_path = f"{self.results_file}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(results, f, indent=2)
+        os.replace(tmp_path, self.results_file)
@@ -128,6 +128,10 @@ ssh $SERVER_USER@$SERVER_IP << 'EOF'
     print_status "Collecting static files..."
     python manage.py collectstatic --noinput
     
+    # Build the Arrow IPC copies of the Medicare benchmark files
+    print_status "Building benchmark Arrow copies..."
+    python manage.py build_benchmark_arrow
+    
     # Restart Django in tmux session
     print_status "Restarting Django application in tmux..."
     
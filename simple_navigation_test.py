@@ -7,13 +7,18 @@ Tests the specific scenario where user leaves insights and comes back
 import os
 import sys
 import time
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
 import urllib.request
 import urllib.error
 
 def test_server_connection():
     """Test if the server is running"""
     try:
-        with urllib.request.urlopen("http://localhost:8000", timeout=5) as response:
+        # HEAD is enough to see the server answer; no page body is transferred
+        request = urllib.request.Request("http://localhost:8000", method="HEAD")
+        with urllib.request.urlopen(request, timeout=5) as response:
             if response.status == 200:
                 print("✅ Server is running")
                 return True
@@ -27,28 +32,28 @@ def test_insights_page(state_code="GA"):
     
     try:
         print(f"🔍 Testing insights page: {url}")
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         
         with urllib.request.urlopen(url, timeout=30) as response:
-            end_time = time.time()
-            content = response.read().decode('utf-8')
+            end_time = time.perf_counter_ns()
+            content = response.read()
             
             print(f"   Status: {response.status}")
-            print(f"   Response time: {end_time - start_time:.3f}s")
+            print(f"   Response time: {(end_time - start_time) / 1e9:.3f}s")
             
             if response.status == 200:
                 # Check for key elements
-                if "filterForm" in content:
+                if b"filterForm" in content:
                     print("   ✅ Filter form found")
                 else:
                     print("   ❌ Filter form NOT found")
                 
-                if "Active Filters" in content:
+                if b"Active Filters" in content:
                     print("   ✅ Active filters section found")
                 else:
                     print("   ❌ Active filters section NOT found")
                 
-                if "An error occurred while processing the data" in content:
+                if b"An error occurred while processing the data" in content:
                     print("   ❌ ERROR MESSAGE FOUND!")
                     return False
                 else:
@@ -99,36 +104,74 @@ def test_navigation_flow(state_code="GA"):
     print("\n✅ Navigation flow test completed successfully!")
     return True
 
+# One keep-alive connection per worker thread, reused across that thread's probes
+_local = threading.local()
+
+def _get_connection():
+    """Get this thread's connection to the server, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = http.client.HTTPConnection("localhost", 8000, timeout=30)
+    return conn
+
+def _drop_connection():
+    """Close this thread's connection so the next probe opens a fresh one"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def _fetch(path):
+    """Fetch a page over this thread's connection; returns (status, raw body bytes, elapsed nanoseconds)"""
+    for attempt in range(2):
+        conn = _get_connection()
+        try:
+            start_time = time.perf_counter_ns()
+            conn.request("GET", path)
+            response = conn.getresponse()
+            content = response.read()
+            elapsed_ns = time.perf_counter_ns() - start_time
+        except ConnectionError:
+            # The server closed an idle keep-alive connection; retry once on a new one
+            _drop_connection()
+            if attempt:
+                raise
+            continue
+        except Exception:
+            _drop_connection()
+            raise
+        if response.will_close:
+            _drop_connection()
+        return response.status, content, elapsed_ns
+
 def test_multiple_requests(state_code="GA"):
     """Test multiple consecutive requests to check for connection issues"""
     print(f"\n🔄 Testing multiple consecutive requests for {state_code}")
     print("=" * 50)
     
-    url = f"http://localhost:8000/commercial/insights/{state_code}/"
+    path = f"/commercial/insights/{state_code}/"
     success_count = 0
     
-    for i in range(5):
+    # Fire every probe at once; each worker thread keeps its own connection
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(_fetch, path) for _ in range(5)]
+    
+    for i, future in enumerate(futures):
         print(f"\nRequest {i+1}/5...")
         try:
-            start_time = time.time()
-            with urllib.request.urlopen(url, timeout=30) as response:
-                end_time = time.time()
-                content = response.read().decode('utf-8')
-                
-                print(f"   Status: {response.status}")
-                print(f"   Response time: {end_time - start_time:.3f}s")
+            status, content, elapsed_ns = future.result()
+            
+            print(f"   Status: {status}")
+            print(f"   Response time: {elapsed_ns / 1e9:.3f}s")
+            
+            if status == 200 and b"An error occurred while processing the data" not in content:
+                success_count += 1
+                print("   ✅ Success")
+            else:
+                print("   ❌ Failed")
                 
-                if response.status == 200 and "An error occurred while processing the data" not in content:
-                    success_count += 1
-                    print("   ✅ Success")
-                else:
-                    print("   ❌ Failed")
-                    
         except Exception as e:
             print(f"   ❌ Error: {str(e)}")
-        
-        # Small delay between requests
-        time.sleep(0.5)
     
     print(f"\n📊 Results: {success_count}/5 requests successful")
     return success_count == 5
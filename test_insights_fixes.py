@@ -7,59 +7,71 @@ Tests the improvements made to caching and data reloading
 import os
 import sys
 import time
+import numpy as np
 import requests
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import json
+from itertools import cycle, islice
 
 # Add the project root to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-class InsightsFixesTest:
-    def __init__(self, base_url="http://localhost:8000"):
-        self.base_url = base_url
-        self.session = requests.Session()
-        self.results = []
-        
+from insights_http import MAX_WORKERS, InsightsTestClient
+
+# Where run_all_tests() writes its results
+RESULTS_FILE = "fix_validation_results.json"
+
+class InsightsFixesTest(InsightsTestClient):
+    results_file = RESULTS_FILE
+    
     def test_cache_consistency_improved(self, state_code="GA"):
         """Test improved cache consistency with identical requests"""
         print(f"\n🧪 Testing improved cache consistency for {state_code}...")
+        # Per-request and summary lines are printed in one write once the test is done
+        log_lines = []
         
         # Test the same filter combination multiple times
-        filter_params = "payer=Aetna&procedure_class=Surgery"
-        url = f"{self.base_url}/commercial/insights/{state_code}/?{filter_params}"
+        url = self._build_url(state_code, {"payer": ["Aetna"], "procedure_class": ["Surgery"]})
         
         response_times = []
+        server_times = []
         cache_hits = 0
         
-        for i in range(10):
-            try:
-                start_time = time.time()
-                response = self.session.get(url, timeout=30)
-                end_time = time.time()
-                
-                response_time = end_time - start_time
-                response_times.append(response_time)
-                
-                # With improved caching, we should see more consistent response times
-                if response_time < 0.2:  # Slightly higher threshold for cache hits
-                    cache_hits += 1
-                
-                print(f"   Request {i+1}: {response_time:.3f}s (Status: {response.status_code})")
-                
-            except Exception as e:
-                print(f"   Request {i+1}: Error - {str(e)}")
+        # The first request warms the cache on its own; the rest go out concurrently,
+        # so the hit rate is measured against a populated cache rather than racing to miss
+        probes = [self._timed_get(url)]
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            probes.extend(executor.map(self._timed_get, [url] * 9))
         
-        avg_response_time = sum(response_times) / len(response_times)
+        for i, (response_time, response, error) in enumerate(probes):
+            if error is not None:
+                log_lines.append(f"   Request {i+1}: Error - {str(error)}")
+                continue
+            
+            response_times.append(response_time)
+            server_times.append(response.elapsed.total_seconds())
+            
+            # The view reports whether it served the context from its cache
+            if response.headers.get("X-Cache") == "HIT":
+                cache_hits += 1
+            
+            log_lines.append(f"   Request {i+1}: {response_time:.3f}s (Status: {response.status_code})")
+        
+        times = np.asarray(response_times, dtype=np.float64)
+        avg_response_time = times.mean()
         cache_hit_rate = cache_hits / len(response_times) * 100
-        response_consistency = max(response_times) - min(response_times)
+        response_consistency = np.ptp(times)
+        avg_server_time = np.mean(server_times)
+        
+        log_lines.append(f"📊 Improved Cache Consistency Results:")
+        log_lines.append(f"   Total Requests: {len(response_times)}")
+        log_lines.append(f"   Cache Hits: {cache_hits}")
+        log_lines.append(f"   Cache Hit Rate: {cache_hit_rate:.1f}%")
+        log_lines.append(f"   Avg Response Time: {avg_response_time:.3f}s")
+        log_lines.append(f"   Response Time Range: {response_consistency:.3f}s")
+        log_lines.append(f"   Avg Server Time: {avg_server_time:.3f}s")
         
-        print(f"📊 Improved Cache Consistency Results:")
-        print(f"   Total Requests: {len(response_times)}")
-        print(f"   Cache Hits: {cache_hits}")
-        print(f"   Cache Hit Rate: {cache_hit_rate:.1f}%")
-        print(f"   Avg Response Time: {avg_response_time:.3f}s")
-        print(f"   Response Time Range: {response_consistency:.3f}s")
+        print("\n".join(log_lines))
         
         return {
             "test": "cache_consistency_improved",
@@ -67,12 +79,14 @@ class InsightsFixesTest:
             "cache_hits": cache_hits,
             "cache_hit_rate": cache_hit_rate,
             "avg_response_time": avg_response_time,
-            "response_consistency": response_consistency
+            "response_consistency": response_consistency,
+            "avg_server_time": avg_server_time
         }
     
     def test_debounced_filtering(self, state_code="GA"):
         """Test debounced filter changes"""
         print(f"\n🧪 Testing debounced filtering for {state_code}...")
+        log_lines = []
         
         # Simulate rapid filter changes
         filter_combinations = [
@@ -82,48 +96,44 @@ class InsightsFixesTest:
             {"procedure_class": ["Medicine"]},
             {"procedure_class": ["Medicine"], "billing_code": ["99213"]},
         ]
+        urls = self._build_urls(state_code, filter_combinations)
         
         response_times = []
         successful_requests = 0
         
-        for i, filter_combo in enumerate(filter_combinations):
-            try:
-                # Build URL with filters
-                params = []
-                for key, values in filter_combo.items():
-                    for value in values:
-                        params.append(f"{key}={value}")
-                
-                url = f"{self.base_url}/commercial/insights/{state_code}/"
-                if params:
-                    url += "?" + "&".join(params)
-                
-                start_time = time.time()
-                response = self.session.get(url, timeout=30)
-                end_time = time.time()
-                
-                response_time = end_time - start_time
-                response_times.append(response_time)
-                
-                if response.status_code == 200:
-                    successful_requests += 1
-                
-                print(f"   Filter combo {i+1}: {response_time:.3f}s (Status: {response.status_code})")
+        # Filter changes are submitted at user pace but run concurrently, so the delay
+        # between changes overlaps the previous request's latency
+        futures = []
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for url in urls:
+                futures.append(executor.submit(self._timed_get, url))
                 
                 # Small delay to simulate user behavior
                 time.sleep(0.1)
-                
-            except Exception as e:
-                print(f"   Filter combo {i+1}: Error - {str(e)}")
         
-        avg_response_time = sum(response_times) / len(response_times)
+        for i, future in enumerate(futures):
+            response_time, response, error = future.result()
+            if error is not None:
+                log_lines.append(f"   Filter combo {i+1}: Error - {str(error)}")
+                continue
+            
+            response_times.append(response_time)
+            
+            if response.status_code == 200:
+                successful_requests += 1
+            
+            log_lines.append(f"   Filter combo {i+1}: {response_time:.3f}s (Status: {response.status_code})")
+        
+        avg_response_time = np.mean(response_times)
         success_rate = successful_requests / len(filter_combinations) * 100
         
-        print(f"📊 Debounced Filtering Results:")
-        print(f"   Total Filter Combinations: {len(filter_combinations)}")
-        print(f"   Successful Requests: {successful_requests}")
-        print(f"   Success Rate: {success_rate:.1f}%")
-        print(f"   Avg Response Time: {avg_response_time:.3f}s")
+        log_lines.append(f"📊 Debounced Filtering Results:")
+        log_lines.append(f"   Total Filter Combinations: {len(filter_combinations)}")
+        log_lines.append(f"   Successful Requests: {successful_requests}")
+        log_lines.append(f"   Success Rate: {success_rate:.1f}%")
+        log_lines.append(f"   Avg Response Time: {avg_response_time:.3f}s")
+        
+        print("\n".join(log_lines))
         
         return {
             "test": "debounced_filtering",
@@ -136,30 +146,30 @@ class InsightsFixesTest:
     def test_connection_pool_efficiency(self, state_code="GA"):
         """Test connection pool efficiency"""
         print(f"\n🧪 Testing connection pool efficiency for {state_code}...")
+        log_lines = []
+        
+        url = self._build_url(state_code, {"payer": ["Aetna"]})
         
         # Test concurrent requests to see if connection pooling helps
         def make_request(request_id):
-            try:
-                url = f"{self.base_url}/commercial/insights/{state_code}/?payer=Aetna"
-                start_time = time.time()
-                response = requests.get(url, timeout=30)
-                end_time = time.time()
-                
+            response_time, response, error = self._timed_get(url)
+            if error is not None:
                 return {
                     "request_id": request_id,
-                    "response_time": end_time - start_time,
-                    "status_code": response.status_code,
-                    "success": response.status_code == 200
-                }
-            except Exception as e:
-                return {
-                    "request_id": request_id,
-                    "error": str(e),
+                    "error": str(error),
                     "success": False
                 }
+            
+            return {
+                "request_id": request_id,
+                "response_time": response_time,
+                "server_elapsed": response.elapsed.total_seconds(),
+                "status_code": response.status_code,
+                "success": response.status_code == 200
+            }
         
         # Make 10 concurrent requests
-        start_time = time.time()
+        start_time = time.perf_counter()
         results = []
         
         with ThreadPoolExecutor(max_workers=10) as executor:
@@ -169,18 +179,20 @@ class InsightsFixesTest:
                 result = future.result()
                 results.append(result)
         
-        end_time = time.time()
+        end_time = time.perf_counter()
         total_time = end_time - start_time
         
         successful_requests = sum(1 for r in results if r.get("success", False))
-        avg_response_time = sum(r.get("response_time", 0) for r in results) / len(results)
+        avg_response_time = np.mean([r.get("response_time", 0) for r in results])
+        
+        log_lines.append(f"📊 Connection Pool Efficiency Results:")
+        log_lines.append(f"   Concurrent Requests: 10")
+        log_lines.append(f"   Successful Requests: {successful_requests}")
+        log_lines.append(f"   Success Rate: {successful_requests/10*100:.1f}%")
+        log_lines.append(f"   Total Time: {total_time:.3f}s")
+        log_lines.append(f"   Avg Response Time: {avg_response_time:.3f}s")
         
-        print(f"📊 Connection Pool Efficiency Results:")
-        print(f"   Concurrent Requests: 10")
-        print(f"   Successful Requests: {successful_requests}")
-        print(f"   Success Rate: {successful_requests/10*100:.1f}%")
-        print(f"   Total Time: {total_time:.3f}s")
-        print(f"   Avg Response Time: {avg_response_time:.3f}s")
+        print("\n".join(log_lines))
         
         return {
             "test": "connection_pool_efficiency",
@@ -194,6 +206,7 @@ class InsightsFixesTest:
     def test_memory_usage_improved(self, state_code="GA"):
         """Test improved memory usage"""
         print(f"\n🧪 Testing improved memory usage for {state_code}...")
+        log_lines = []
         
         # Make many requests to test for memory leaks
         filter_combinations = [
@@ -203,101 +216,103 @@ class InsightsFixesTest:
             {"cbsa": ["Atlanta"]},
             {"procedure_set": ["Cardiology"]},
         ]
+        urls = self._build_urls(state_code, filter_combinations)
         
         response_sizes = []
         response_times = []
+        content_encodings = set()
         
-        for i in range(50):  # More requests to test memory
-            filter_combo = filter_combinations[i % len(filter_combinations)]
+        request_urls = list(islice(cycle(urls), 50))  # More requests to test memory
+        
+        # Issue all requests concurrently; map() keeps them in request order
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            probes = list(executor.map(self._timed_size, request_urls))
+        
+        for i, (response_time, size, encoding, error) in enumerate(probes):
+            if error is not None:
+                log_lines.append(f"   Request {i+1}: Error - {str(error)}")
+                continue
             
-            try:
-                # Build URL with filters
-                params = []
-                for key, values in filter_combo.items():
-                    for value in values:
-                        params.append(f"{key}={value}")
-                
-                url = f"{self.base_url}/commercial/insights/{state_code}/"
-                if params:
-                    url += "?" + "&".join(params)
-                
-                start_time = time.time()
-                response = self.session.get(url, timeout=30)
-                end_time = time.time()
-                
-                response_sizes.append(len(response.content))
-                response_times.append(end_time - start_time)
-                
-                if i % 10 == 0:  # Print progress every 10 requests
-                    print(f"   Request {i+1}: {len(response.content)} bytes, {end_time - start_time:.3f}s")
-                
-            except Exception as e:
-                print(f"   Request {i+1}: Error - {str(e)}")
+            response_sizes.append(size)
+            response_times.append(response_time)
+            content_encodings.add(encoding)
+            
+            if i % 10 == 0:  # Print progress every 10 requests
+                log_lines.append(f"   Request {i+1}: {size} bytes, {response_time:.3f}s")
         
-        avg_response_size = sum(response_sizes) / len(response_sizes)
-        avg_response_time = sum(response_times) / len(response_times)
+        times = np.asarray(response_times, dtype=np.float64)
+        avg_response_size = np.mean(response_sizes)
+        avg_response_time = times.mean()
         
         # Check for memory leak indicators (increasing response times)
-        first_half_avg = sum(response_times[:25]) / 25
-        second_half_avg = sum(response_times[25:]) / 25
+        first_half_avg = times[:25].mean()
+        second_half_avg = times[25:].mean()
         time_increase = (second_half_avg - first_half_avg) / first_half_avg * 100
         
-        print(f"📊 Improved Memory Usage Results:")
-        print(f"   Total Requests: {len(response_sizes)}")
-        print(f"   Avg Response Size: {avg_response_size:.0f} bytes")
-        print(f"   Avg Response Time: {avg_response_time:.3f}s")
-        print(f"   Time Increase: {time_increase:.1f}% (negative is good)")
+        log_lines.append(f"📊 Improved Memory Usage Results:")
+        log_lines.append(f"   Total Requests: {len(response_sizes)}")
+        log_lines.append(f"   Avg Response Size: {avg_response_size:.0f} bytes")
+        log_lines.append(f"   Avg Response Time: {avg_response_time:.3f}s")
+        log_lines.append(f"   Time Increase: {time_increase:.1f}% (negative is good)")
+        log_lines.append(f"   Content-Encoding: {', '.join(sorted(content_encodings))}")
+        
+        print("\n".join(log_lines))
         
         return {
             "test": "memory_usage_improved",
             "total_requests": len(response_sizes),
             "avg_response_size": avg_response_size,
             "avg_response_time": avg_response_time,
-            "time_increase": time_increase
+            "time_increase": time_increase,
+            # "identity" here means the server never compressed the page
+            "content_encoding": sorted(content_encodings)
         }
     
     def test_service_worker_cache_handling(self, state_code="GA"):
         """Test service worker cache handling improvements"""
         print(f"\n🧪 Testing service worker cache handling for {state_code}...")
+        log_lines = []
         
         # Test base page (should be cached)
-        base_url = f"{self.base_url}/commercial/insights/{state_code}/"
+        base_url = self._build_url(state_code)
         
         # Test filtered page (should not be cached)
-        filtered_url = f"{self.base_url}/commercial/insights/{state_code}/?payer=Aetna"
+        filtered_url = self._build_url(state_code, {"payer": ["Aetna"]})
         
         base_times = []
         filtered_times = []
         
+        # Run the base and filtered sequences side by side; each stays serial within itself
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            base_future = executor.submit(self._run_n, base_url, 5)
+            filtered_future = executor.submit(self._run_n, filtered_url, 5)
+            base_probes, filtered_probes = base_future.result(), filtered_future.result()
+        
         # Test base page multiple times
-        for i in range(5):
-            try:
-                start_time = time.time()
-                response = self.session.get(base_url, timeout=30)
-                end_time = time.time()
-                base_times.append(end_time - start_time)
-                print(f"   Base page {i+1}: {end_time - start_time:.3f}s")
-            except Exception as e:
-                print(f"   Base page {i+1}: Error - {str(e)}")
+        for i, (response_time, _, error) in enumerate(base_probes):
+            if error is not None:
+                log_lines.append(f"   Base page {i+1}: Error - {str(error)}")
+                continue
+            base_times.append(response_time)
+            log_lines.append(f"   Base page {i+1}: {response_time:.3f}s")
         
         # Test filtered page multiple times
-        for i in range(5):
-            try:
-                start_time = time.time()
-                response = self.session.get(filtered_url, timeout=30)
-                end_time = time.time()
-                filtered_times.append(end_time - start_time)
-                print(f"   Filtered page {i+1}: {end_time - start_time:.3f}s")
-            except Exception as e:
-                print(f"   Filtered page {i+1}: Error - {str(e)}")
-        
-        base_avg = sum(base_times) / len(base_times)
-        filtered_avg = sum(filtered_times) / len(filtered_times)
-        
-        print(f"📊 Service Worker Cache Handling Results:")
-        print(f"   Base Page Avg Time: {base_avg:.3f}s")
-        print(f"   Filtered Page Avg Time: {filtered_avg:.3f}s")
-        print(f"   Cache Effectiveness: {((base_avg - filtered_avg) / base_avg * 100):.1f}%")
+        for i, (response_time, _, error) in enumerate(filtered_probes):
+            if error is not None:
+                log_lines.append(f"   Filtered page {i+1}: Error - {str(error)}")
+                continue
+            filtered_times.append(response_time)
+            log_lines.append(f"   Filtered page {i+1}: {response_time:.3f}s")
+        
+        base_avg = np.mean(base_times)
+        filtered_avg = np.mean(filtered_times)
+        
+        log_lines.append(f"📊 Service Worker Cache Handling Results:")
+        log_lines.append(f"   Base Page Avg Time: {base_avg:.3f}s")
+        log_lines.append(f"   Filtered Page Avg Time: {filtered_avg:.3f}s")
+        log_lines.append(f"   Cache Effectiveness: {((base_avg - filtered_avg) / base_avg * 100):.1f}%")
+        
+        print("\n".join(log_lines))
         
         return {
             "test": "service_worker_cache_handling",
@@ -312,57 +327,68 @@ class InsightsFixesTest:
         print("=" * 70)
         
         results = []
+        # Response consistency, the memory-leak time increase and cache effectiveness are
+        # timing-based, so these phases run one at a time with nothing else loading the server
+        timing_tests = [
+            self.test_cache_consistency_improved,  # Test 1: Improved cache consistency
+            self.test_memory_usage_improved,  # Test 4: Improved memory usage
+            self.test_service_worker_cache_handling,  # Test 5: Service worker cache handling
+        ]
+        # These only judge whether requests succeed, so they can share the server
+        smoke_tests = [
+            self.test_debounced_filtering,  # Test 2: Debounced filtering
+            self.test_connection_pool_efficiency,  # Test 3: Connection pool efficiency
+        ]
         
-        # Test 1: Improved cache consistency
-        results.append(self.test_cache_consistency_improved(state_code))
-        
-        # Test 2: Debounced filtering
-        results.append(self.test_debounced_filtering(state_code))
-        
-        # Test 3: Connection pool efficiency
-        results.append(self.test_connection_pool_efficiency(state_code))
-        
-        # Test 4: Improved memory usage
-        results.append(self.test_memory_usage_improved(state_code))
+        for test in timing_tests:
+            results.append(test(state_code))
+            # Snapshot after every test so a crash mid-run keeps the completed results
+            self._save_results(results)
         
-        # Test 5: Service worker cache handling
-        results.append(self.test_service_worker_cache_handling(state_code))
+        with ThreadPoolExecutor(max_workers=len(smoke_tests)) as executor:
+            futures = [executor.submit(test, state_code) for test in smoke_tests]
+            
+            for future in as_completed(futures):
+                results.append(future.result())
+                self._save_results(results)
         
         # Summary
         print("\n" + "=" * 70)
         print("📋 FIX VALIDATION SUMMARY")
         print("=" * 70)
         
-        # Calculate overall improvements
-        total_requests = sum(r.get("total_requests", 0) for r in results)
-        total_successful = sum(r.get("successful_requests", 0) for r in results)
-        
-        print(f"Total Requests: {total_requests}")
-        print(f"Successful Requests: {total_successful}")
-        print(f"Overall Success Rate: {total_successful/total_requests*100:.1f}%")
+        # Calculate overall improvements and pick out the specific ones in a single pass
+        summary = {"total_requests": 0, "successful": 0}
+        for r in results:
+            summary["total_requests"] += r.get("total_requests", 0)
+            summary["successful"] += r.get("successful_requests", 0)
+            if r["test"] == "cache_consistency_improved":
+                summary["cache_hit_rate"] = r["cache_hit_rate"]
+                summary["response_consistency"] = r["response_consistency"]
+            elif r["test"] == "memory_usage_improved":
+                summary["time_increase"] = r["time_increase"]
+        
+        print(f"Total Requests: {summary['total_requests']}")
+        print(f"Successful Requests: {summary['successful']}")
+        print(f"Overall Success Rate: {summary['successful']/summary['total_requests']*100:.1f}%")
         
         # Check specific improvements
-        cache_consistency = next((r for r in results if r["test"] == "cache_consistency_improved"), None)
-        if cache_consistency:
-            print(f"Cache Hit Rate: {cache_consistency['cache_hit_rate']:.1f}%")
-            print(f"Response Consistency: {cache_consistency['response_consistency']:.3f}s")
-        
-        memory_test = next((r for r in results if r["test"] == "memory_usage_improved"), None)
-        if memory_test:
-            print(f"Memory Leak Indicator: {memory_test['time_increase']:.1f}%")
+        if "cache_hit_rate" in summary:
+            print(f"Cache Hit Rate: {summary['cache_hit_rate']:.1f}%")
+            print(f"Response Consistency: {summary['response_consistency']:.3f}s")
         
-        # Save results
-        with open("fix_validation_results.json", "w") as f:
-            json.dump(results, f, indent=2)
+        if "time_increase" in summary:
+            print(f"Memory Leak Indicator: {summary['time_increase']:.1f}%")
         
-        print(f"\n💾 Results saved to fix_validation_results.json")
+        print(f"\n💾 Results saved to {RESULTS_FILE}")
         
         return results
 
 if __name__ == "__main__":
     # Check if server is running
     try:
-        response = requests.get("http://localhost:8000", timeout=5)
+        # HEAD only confirms the server answers; the home page body is never transferred
+        response = requests.head("http://localhost:8000/", timeout=5, allow_redirects=False)
         print("✅ Server is running")
     except:
         print("❌ Server is not running. Please start the Django server first.")
@@ -0,0 +1,11 @@
+"""
+Shared pytest setup for the data-layer tests.
+
+Puts the project root on sys.path so the tests can import the core package
+without importing anything heavy at collection time.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
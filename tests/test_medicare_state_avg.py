@@ -0,0 +1,90 @@
+"""
+Tests for the Medicare professional rate state average calculation.
+
+These run against the real benchmarks database and are skipped when it is
+not present, since it is not checked in.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Test parameters
+TEST_CASES = [
+    {
+        'cpt_code': '73721',  # MRI of knee
+        'state': 'GA',
+        'year': 2025
+    },
+    {
+        'cpt_code': '99213',  # Office visit
+        'state': 'GA',
+        'year': 2025
+    },
+    {
+        'cpt_code': '73721',
+        'state': 'CA',
+        'year': 2025
+    }
+]
+
+BENCHMARKS_DB = Path(__file__).resolve().parent.parent / 'core' / 'data' / 'benchmarks' / 'benchmarks.db'
+
+requires_benchmarks_db = pytest.mark.skipif(not BENCHMARKS_DB.exists(), reason="benchmarks database not available")
+
+
+@requires_benchmarks_db
+@pytest.mark.parametrize(
+    'cpt_code,state,year',
+    [(case['cpt_code'], case['state'], case['year']) for case in TEST_CASES]
+)
+def test_state_avg(cpt_code, state, year):
+    """
+    Each case is its own test, so pytest-xdist can spread them across workers:
+    pytest -n 3 tests/test_medicare_state_avg.py
+    """
+    from core.utils.medicare_benchmarks import get_medicare_lookup
+
+    rate = get_medicare_lookup().get_professional_rate_state_avg(cpt_code, state, year)
+    assert rate is not None
+
+
+@requires_benchmarks_db
+def test_state_average_calculation():
+    """The batch lookup and the comprehensive lookup agree with the single-pair state averages."""
+    # Imported here so collecting or importing this module doesn't start pandas/pyarrow/duckdb
+    from core.utils.medicare_benchmarks import get_medicare_lookup
+
+    medicare_lookup = get_medicare_lookup()
+
+    # The comprehensive lookup (SQLite query plus ASC/OPPS parquet loads) is independent
+    # of the cases, so it runs in the background while the batch below is in flight
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        comprehensive_future = executor.submit(
+            medicare_lookup.get_comprehensive_rates,
+            cpt_code='73721',
+            zip_code='30309',  # This will be ignored when use_state_avg=True
+            state='GA',
+            year=2025,
+            use_state_avg=True
+        )
+
+        # Look up every case in one batch call instead of one query per case; the batch
+        # already spreads its pairs across a thread pool
+        state_avg_rates = medicare_lookup.get_professional_rates_state_avg(
+            [(case['cpt_code'], case['state']) for case in TEST_CASES],
+            year=2025
+        )
+        comprehensive_rates = comprehensive_future.result()
+
+    for case in TEST_CASES:
+        rate = state_avg_rates[(case['cpt_code'], case['state'])]
+        assert rate is not None
+        assert rate == pytest.approx(
+            medicare_lookup.get_professional_rate_state_avg(case['cpt_code'], case['state'], case['year'])
+        )
+
+    assert comprehensive_rates['metadata']['use_state_avg'] is True
+    assert comprehensive_rates['professional_rate_state_avg'] == pytest.approx(state_avg_rates[('73721', 'GA')])
+    assert comprehensive_rates['professional_rate'] == comprehensive_rates['professional_rate_state_avg']
@@ -0,0 +1,35 @@
+"""
+Tests for the parquet data manager.
+
+Runs against the configured commercial rates parquet file when it is present,
+and against the built-in sample data otherwise.
+"""
+
+
+def test_parquet_manager():
+    # Imported here so collecting or importing this module doesn't start pandas/pyarrow/duckdb
+    from core.utils.parquet_utils import get_data_manager
+
+    # Get the shared data manager
+    dm = get_data_manager()
+
+    if dm.has_data:
+        # Unique values, stats and sample records all come from one overview call
+        overview = dm.get_overview(unique_cols=('payer', 'org_name', 'billing_class'), sample_limit=3)
+
+        assert set(overview['unique']) == {'payer', 'org_name', 'billing_class'}
+        assert overview['unique']['payer']
+        assert overview['unique']['org_name']
+        assert overview['unique']['billing_class']
+
+        stats = overview['stats']
+
+        sample = overview['sample']
+        assert set(sample) == {'billing_code', 'org_name', 'rate'}
+        assert 0 < len(sample['rate']) <= 3
+        assert len(sample['billing_code']) == len(sample['org_name']) == len(sample['rate'])
+    else:
+        stats = dm.get_aggregated_stats()
+
+    assert 'professional' in stats
+    assert 'facility' in stats